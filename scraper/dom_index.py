@@ -0,0 +1,40 @@
+"""
+Shared element index for the extractor scripts
+"""
+
+# Every element in the document, in document order and grouped by tag
+# name, plus a computed style cache. Each extractor script takes one as
+# an argument, so when extract_all runs them together the DOM is walked
+# and each element's style is computed only once. Extractors called on
+# their own build their own index.
+DOM_INDEX_JS = """
+    () => {
+        const elements = Array.from(document.getElementsByTagName('*'));
+        const byTag = new Map();
+        for (const el of elements) {
+            const list = byTag.get(el.tagName);
+            if (list) {
+                list.push(el);
+            } else {
+                byTag.set(el.tagName, [el]);
+            }
+        }
+        
+        const styles = new Map();
+        
+        return {
+            elements: elements,
+            // Elements with this tag name (uppercase for HTML, e.g. 'IMG';
+            // lowercase for SVG, e.g. 'svg'), in document order
+            tag: name => byTag.get(name) || [],
+            style: el => {
+                let style = styles.get(el);
+                if (style === undefined) {
+                    style = window.getComputedStyle(el);
+                    styles.set(el, style);
+                }
+                return style;
+            }
+        };
+    }
+"""
@@ -0,0 +1,70 @@
+"""
+Run every extractor in a single page.evaluate round-trip
+"""
+
+from .dom_index import DOM_INDEX_JS
+from .extract_content import EXTRACT_CONTENT_JS
+from .extract_assets import EXTRACT_ASSETS_JS
+from .extract_tokens import EXTRACT_TOKENS_JS
+from .extract_meta import EXTRACT_META_JS
+
+
+# Each extractor's script is a function expression, so they can be called
+# in turn from one wrapper, sharing one DOM index, and their results
+# returned together. A failing extractor leaves an empty result and its
+# error under 'errors' instead of failing the whole evaluate.
+EXTRACT_ALL_JS = (
+    "(url) => {\n"
+    "    const dom = (" + DOM_INDEX_JS + ")();\n"
+    "    const result = {errors: {}};\n"
+    "    function run(name, extractor, ...args) {\n"
+    "        try {\n"
+    "            result[name] = extractor(...args);\n"
+    "        } catch (e) {\n"
+    "            result[name] = {};\n"
+    "            result.errors[name] = String(e && e.stack || e);\n"
+    "        }\n"
+    "    }\n"
+    "    run('content', " + EXTRACT_CONTENT_JS + ", dom);\n"
+    "    run('assets', " + EXTRACT_ASSETS_JS + ", url, dom);\n"
+    "    run('tokens', " + EXTRACT_TOKENS_JS + ", dom);\n"
+    "    run('meta', " + EXTRACT_META_JS + ", url, dom);\n"
+    "    return result;\n"
+    "}"
+)
+
+# Installs EXTRACT_ALL_JS as a hidden window function. Added to a context
+# with add_init_script, the extractors are parsed and compiled while the
+# page loads instead of on the extraction critical path. Only the top
+# frame needs it, and it's non-enumerable so page scripts don't see it.
+EXTRACT_ALL_INIT_JS = (
+    "if (window.top === window) {\n"
+    "    Object.defineProperty(window, '__scraperExtractAll', {value: " + EXTRACT_ALL_JS + "});\n"
+    "}\n"
+)
+
+
+async def extract_all(page, url):
+    """
+    Extract content, assets, design tokens and metadata in one call.
+    
+    Same results as the four extract_* functions, but with a single
+    round-trip to the browser and one result to deserialize. Uses the
+    copy installed by EXTRACT_ALL_INIT_JS when the page has one.
+    
+    Returns a dict with 'content', 'assets', 'tokens' and 'meta' keys,
+    plus 'errors' mapping the name of any extractor that threw to its
+    error. That extractor's result is left empty.
+    """
+    
+    result = await page.evaluate(
+        "(url) => window.__scraperExtractAll ? window.__scraperExtractAll(url) : null",
+        url
+    )
+    if result is None:
+        result = await page.evaluate(EXTRACT_ALL_JS, url)
+    
+    for name, error in result['errors'].items():
+        print(f"[Warning] Failed to extract {name}: {error}")
+    
+    return result
@@ -2,122 +2,276 @@
 Extract and download images, SVGs, and other assets
 """
 
+import aiofiles
 import aiohttp
 import asyncio
+import blake3
 from pathlib import Path
 from urllib.parse import urljoin, urlparse
-import hashlib
-from PIL import Image
 import io
+import tempfile
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
 
+from .dom_index import DOM_INDEX_JS
 
-async def extract_assets(page, base_url):
-    """
-    Extract all images (img tags, CSS backgrounds, inline SVGs).
-    
-    Returns list of assets with URLs and metadata.
-    """
-    
-    assets = await page.evaluate("""
-        (baseUrl) => {
-            const result = {
-                images: [],
-                svgs: [],
-                backgrounds: []
-            };
-            
-            const seen = new Set();
+
+EXTRACT_ASSETS_JS = """
+    (baseUrl, dom) => {
+        dom = dom || (""" + DOM_INDEX_JS + """)();
+        
+        const result = {
+            images: [],
+            svgs: [],
+            backgrounds: []
+        };
+        
+        const seen = new Set();
+        
+        // Compiled once rather than per element. SRCSET_RE captures the
+        // URL of each srcset candidate and skips its width/density
+        // descriptor; BACKGROUND_URL_RE pulls the URL out of url(...).
+        const SRCSET_RE = /([^\\s,]+)(?:\\s+[^,]*)?/g;
+        const BACKGROUND_URL_RE = /url\\(["\']?([^"\'\\)]+)["\']?\\)/;
+        
+        // Helper to resolve URLs
+        function resolveUrl(url) {
+            try {
+                return new URL(url, baseUrl).href;
+            } catch {
+                return null;
+            }
+        }
+        
+        // Extract <img> tags
+        dom.tag('IMG').forEach(img => {
+            const src = img.getAttribute('src') || img.getAttribute('data-src');
+            const srcset = img.getAttribute('srcset');
+            const alt = img.getAttribute('alt') || '';
             
-            // Helper to resolve URLs
-            function resolveUrl(url) {
-                try {
-                    return new URL(url, baseUrl).href;
-                } catch {
-                    return null;
+            if (src) {
+                const fullUrl = resolveUrl(src);
+                if (fullUrl && !seen.has(fullUrl)) {
+                    seen.add(fullUrl);
+                    result.images.push({
+                        url: fullUrl,
+                        alt: alt,
+                        width: img.naturalWidth || img.width,
+                        height: img.naturalHeight || img.height,
+                        type: 'img'
+                    });
                 }
             }
             
-            // Extract <img> tags
-            document.querySelectorAll('img').forEach(img => {
-                const src = img.getAttribute('src') || img.getAttribute('data-src');
-                const srcset = img.getAttribute('srcset');
-                const alt = img.getAttribute('alt') || '';
-                
-                if (src) {
-                    const fullUrl = resolveUrl(src);
+            // Parse srcset for additional images
+            if (srcset) {
+                for (const match of srcset.matchAll(SRCSET_RE)) {
+                    const fullUrl = resolveUrl(match[1]);
                     if (fullUrl && !seen.has(fullUrl)) {
                         seen.add(fullUrl);
                         result.images.push({
                             url: fullUrl,
                             alt: alt,
-                            width: img.naturalWidth || img.width,
-                            height: img.naturalHeight || img.height,
-                            type: 'img'
+                            type: 'srcset'
                         });
                     }
                 }
-                
-                // Parse srcset for additional images
-                if (srcset) {
-                    srcset.split(',').forEach(src => {
-                        const url = src.trim().split(' ')[0];
-                        const fullUrl = resolveUrl(url);
-                        if (fullUrl && !seen.has(fullUrl)) {
-                            seen.add(fullUrl);
-                            result.images.push({
-                                url: fullUrl,
-                                alt: alt,
-                                type: 'srcset'
-                            });
-                        }
-                    });
-                }
-            });
+            }
+        });
+        
+        // Find the elements that can have a background image: those with
+        // an inline background and those matched by a stylesheet rule that
+        // sets one. Returns null when a stylesheet can't be read (e.g.
+        // cross-origin), in which case every element has to be checked.
+        function findBackgroundCandidates() {
+            const selectors = ['[style*="background"]'];
             
-            // Extract CSS background images
-            document.querySelectorAll('*').forEach(el => {
-                const style = window.getComputedStyle(el);
-                const bgImage = style.backgroundImage;
-                
-                if (bgImage && bgImage !== 'none') {
-                    const matches = bgImage.match(/url\\(["\']?([^"\'\\)]+)["\']?\\)/);
-                    if (matches && matches[1]) {
-                        const fullUrl = resolveUrl(matches[1]);
-                        if (fullUrl && !seen.has(fullUrl)) {
-                            seen.add(fullUrl);
-                            result.backgrounds.push({
-                                url: fullUrl,
-                                element: el.tagName.toLowerCase(),
-                                type: 'background'
-                            });
+            function collect(rules) {
+                for (const rule of rules) {
+                    if (rule.styleSheet) {
+                        // @import: throws if the imported sheet is cross-origin
+                        collect(rule.styleSheet.cssRules);
+                    }
+                    if (rule.selectorText && rule.style) {
+                        const bg = rule.style.backgroundImage || rule.style.getPropertyValue('background');
+                        if (bg && bg !== 'none' && bg !== 'initial') {
+                            selectors.push(rule.selectorText);
                         }
                     }
+                    if (rule.cssRules) {
+                        // @media, @supports, @layer and nested rules
+                        collect(rule.cssRules);
+                    }
                 }
-            });
+            }
             
-            // Extract inline SVGs
-            document.querySelectorAll('svg').forEach((svg, index) => {
-                const svgContent = svg.outerHTML;
-                result.svgs.push({
-                    content: svgContent,
-                    index: index,
-                    width: svg.getAttribute('width'),
-                    height: svg.getAttribute('height'),
-                    type: 'inline-svg'
-                });
-            });
+            try {
+                for (const sheet of [...document.styleSheets, ...(document.adoptedStyleSheets || [])]) {
+                    collect(sheet.cssRules);
+                }
+            } catch {
+                return null;
+            }
             
-            return result;
+            try {
+                return new Set(document.querySelectorAll(selectors.join(',')));
+            } catch {
+                // One unsupported selector invalidates the whole list
+                const candidates = new Set();
+                for (const selector of selectors) {
+                    try {
+                        document.querySelectorAll(selector).forEach(el => candidates.add(el));
+                    } catch {}
+                }
+                return candidates;
+            }
         }
-    """, base_url)
+        
+        const backgroundCandidates = findBackgroundCandidates();
+        
+        // Extract CSS background images
+        dom.elements.forEach(el => {
+            // Skip getComputedStyle (which forces a style recalc) for
+            // elements no rule can give a background image
+            if (backgroundCandidates && !backgroundCandidates.has(el)) {
+                return;
+            }
+            
+            // An inline url() background wins over stylesheet rules (short
+            // of !important), so read it directly when present
+            const inline = el.style.backgroundImage;
+            const bgImage = inline && inline.includes('url(')
+                ? inline
+                : dom.style(el).backgroundImage;
+            if (!bgImage || bgImage === 'none') {
+                return;
+            }
+            
+            const matches = BACKGROUND_URL_RE.exec(bgImage);
+            if (matches && matches[1]) {
+                const fullUrl = resolveUrl(matches[1]);
+                if (fullUrl && !seen.has(fullUrl)) {
+                    seen.add(fullUrl);
+                    result.backgrounds.push({
+                        url: fullUrl,
+                        element: el.tagName.toLowerCase(),
+                        type: 'background'
+                    });
+                }
+            }
+        });
+        
+        // Extract inline SVGs
+        dom.tag('svg').forEach((svg, index) => {
+            const svgContent = svg.outerHTML;
+            result.svgs.push({
+                content: svgContent,
+                index: index,
+                width: svg.getAttribute('width'),
+                height: svg.getAttribute('height'),
+                type: 'inline-svg'
+            });
+        });
+        
+        return result;
+    }
+"""
+
+
+async def extract_assets(page, base_url):
+    """
+    Extract all images (img tags, CSS backgrounds, inline SVGs).
+    
+    Returns list of assets with URLs and metadata.
+    """
+    
+    assets = await page.evaluate(EXTRACT_ASSETS_JS, base_url)
     
     return assets
 
 
-async def download_assets(assets_data, convert_to_webp=True):
+# Upper bound on simultaneous asset downloads per scrape
+MAX_CONCURRENT_DOWNLOADS = 20
+
+# Downloads are streamed in chunks of this size and held in memory up to
+# SPOOL_MAX_SIZE bytes, spilling to a temporary file beyond that
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+SPOOL_MAX_SIZE = 4 * 1024 * 1024
+
+# Images above this many pixels are saved as downloaded rather than
+# decoded for WebP; a decoded 40MP RGBA image alone is ~160MB
+MAX_ENCODE_PIXELS = 40_000_000
+
+# When converting to WebP, ask origins for WebP up front. Image CDNs that
+# honour this send it directly and we skip transcoding. AVIF is left out:
+# the output is promised as WebP, and Pillow here can't read AVIF anyway.
+IMAGE_ACCEPT = 'image/webp,image/*;q=0.8'
+NEGOTIATED_FORMATS = {
+    'image/webp': '.webp'
+}
+
+
+def create_http_session():
+    """
+    Create an aiohttp session tuned for asset downloads.
+    
+    Meant to be long-lived so keep-alive connections and DNS lookups are
+    reused across scrapes. aiohttp advertises gzip/deflate, plus br when
+    Brotli is installed (the aiohttp[speedups] extra), and decodes
+    compressed responses transparently.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=200,
+        limit_per_host=10,
+        ttl_dns_cache=300,
+        keepalive_timeout=30
+    )
+    return aiohttp.ClientSession(connector=connector)
+
+
+class EncodingPool(Executor):
+    """
+    Process pool for WebP encoding that replaces itself once broken.
+    
+    A worker dying (OOM-killed, or a crash inside Pillow) breaks a
+    ProcessPoolExecutor for good: every later submit raises
+    BrokenProcessPool. The encode that was running when it died still
+    fails, but the next submit starts a fresh pool instead of every
+    conversion failing until the process restarts.
+    """
+    
+    def __init__(self):
+        self._pool = self._new_pool()
+    
+    @staticmethod
+    def _new_pool():
+        # "spawn" avoids forking a process that already has threads running
+        return ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+    
+    def submit(self, fn, /, *args, **kwargs):
+        try:
+            return self._pool.submit(fn, *args, **kwargs)
+        except BrokenProcessPool:
+            print("[Warning] WebP encoding pool broke (a worker died); starting a new one")
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = self._new_pool()
+            return self._pool.submit(fn, *args, **kwargs)
+    
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        self._pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+async def download_assets(assets_data, convert_to_webp=True, session=None, executor=None):
     """
     Download all assets and save them locally.
     Converts raster images to WebP and deduplicates.
+    
+    Images are fetched concurrently, bounded by MAX_CONCURRENT_DOWNLOADS.
+    Pass a shared `session` to reuse connections; otherwise a temporary
+    one is created and closed for this call. WebP encoding runs in
+    `executor` (ideally an EncodingPool so images encode on separate
+    cores), or the event loop's default executor when None.
     """
     
     images_dir = Path("assets/images")
@@ -125,100 +279,36 @@ async def download_assets(assets_data, convert_to_webp=True):
     images_dir.mkdir(parents=True, exist_ok=True)
     svg_dir.mkdir(parents=True, exist_ok=True)
     
-    downloaded_images = []
-    downloaded_svgs = []
     seen_hashes = {}
     
     # Download images
     all_images = assets_data.get('images', []) + assets_data.get('backgrounds', [])
     
-    async with aiohttp.ClientSession() as session:
-        for img_data in all_images:
-            try:
-                url = img_data['url']
-                
-                # Skip data URLs
-                if url.startswith('data:'):
-                    continue
-                
-                # Download image
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=30)) as response:
-                    if response.status == 200:
-                        content = await response.read()
-                        
-                        # Calculate hash for deduplication
-                        file_hash = hashlib.md5(content).hexdigest()
-                        
-                        if file_hash in seen_hashes:
-                            # Skip duplicate
-                            img_data['local_path'] = seen_hashes[file_hash]
-                            downloaded_images.append(img_data)
-                            continue
-                        
-                        # Determine file extension
-                        parsed = urlparse(url)
-                        original_ext = Path(parsed.path).suffix.lower()
-                        
-                        # Convert to WebP if requested and it's a raster image
-                        if convert_to_webp and original_ext in ['.jpg', '.jpeg', '.png', '.gif']:
-                            try:
-                                image = Image.open(io.BytesIO(content))
-                                
-                                # Convert to RGB if needed
-                                if image.mode in ('RGBA', 'LA', 'P'):
-                                    background = Image.new('RGB', image.size, (255, 255, 255))
-                                    if image.mode == 'P':
-                                        image = image.convert('RGBA')
-                                    background.paste(image, mask=image.split()[-1] if 'A' in image.mode else None)
-                                    image = background
-                                elif image.mode != 'RGB':
-                                    image = image.convert('RGB')
-                                
-                                # Save as WebP
-                                filename = f"{file_hash}.webp"
-                                filepath = images_dir / filename
-                                image.save(filepath, 'WEBP', quality=85)
-                                
-                                img_data['local_path'] = f"assets/images/{filename}"
-                                img_data['converted'] = True
-                                seen_hashes[file_hash] = img_data['local_path']
-                                
-                            except Exception as e:
-                                print(f"[Warning] Could not convert {url} to WebP: {e}")
-                                # Save original
-                                ext = original_ext or '.jpg'
-                                filename = f"{file_hash}{ext}"
-                                filepath = images_dir / filename
-                                filepath.write_bytes(content)
-                                img_data['local_path'] = f"assets/images/{filename}"
-                                seen_hashes[file_hash] = img_data['local_path']
-                        else:
-                            # Save original
-                            ext = original_ext or '.jpg'
-                            filename = f"{file_hash}{ext}"
-                            filepath = images_dir / filename
-                            filepath.write_bytes(content)
-                            img_data['local_path'] = f"assets/images/{filename}"
-                            seen_hashes[file_hash] = img_data['local_path']
-                        
-                        downloaded_images.append(img_data)
-                        
-            except Exception as e:
-                print(f"[Warning] Failed to download {img_data.get('url')}: {e}")
-                continue
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+    owns_session = session is None
+    if owns_session:
+        session = create_http_session()
+    
+    try:
+        results = await asyncio.gather(
+            *(
+                _download_image(session, semaphore, img_data, images_dir, seen_hashes, convert_to_webp, executor)
+                for img_data in all_images
+            ),
+            return_exceptions=True
+        )
+    finally:
+        if owns_session:
+            await session.close()
+    
+    # gather() preserves input order, so the output order matches the page
+    downloaded_images = [result for result in results if isinstance(result, dict)]
     
     # Save inline SVGs
-    for svg_data in assets_data.get('svgs', []):
-        try:
-            index = svg_data['index']
-            content = svg_data['content']
-            filename = f"inline-svg-{index}.svg"
-            filepath = svg_dir / filename
-            filepath.write_text(content, encoding='utf-8')
-            svg_data['local_path'] = f"assets/svg/{filename}"
-            downloaded_svgs.append(svg_data)
-        except Exception as e:
-            print(f"[Warning] Failed to save SVG {index}: {e}")
+    svg_results = await asyncio.gather(
+        *(_save_svg(svg_data, svg_dir) for svg_data in assets_data.get('svgs', []))
+    )
+    downloaded_svgs = [svg_data for svg_data in svg_results if svg_data is not None]
     
     return {
         'images': downloaded_images,
@@ -227,3 +317,172 @@ async def download_assets(assets_data, convert_to_webp=True):
         'total_svgs': len(downloaded_svgs),
         'deduplicated': len(all_images) - len(downloaded_images)
     }
+
+
+async def _download_image(session, semaphore, img_data, images_dir, seen_hashes, convert_to_webp, executor=None):
+    """
+    Download a single image and save it under images_dir.
+    
+    Returns the updated img_data, or None if the image was skipped or failed.
+    """
+    
+    url = img_data['url']
+    
+    # Skip data URLs
+    if url.startswith('data:'):
+        return None
+    
+    try:
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as spool:
+            # Stream the body, hashing as it arrives, so large images never
+            # sit fully in memory. BLAKE3 is several times faster than md5 on
+            # multi-MB images; 16 bytes keeps filenames the same length.
+            hasher = blake3.blake3()
+            headers = {'Accept': IMAGE_ACCEPT} if convert_to_webp else None
+            async with semaphore:
+                async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=30)) as response:
+                    if response.status != 200:
+                        return None
+                    content_type = response.content_type
+                    async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                        hasher.update(chunk)
+                        spool.write(chunk)
+            
+            file_hash = hasher.hexdigest(length=16)
+            
+            # seen_hashes maps a hash to a future resolving to its local path, so a
+            # duplicate that arrives while the first copy is still encoding waits
+            # for it instead of encoding the same bytes again. Duplicates are
+            # discarded without touching disk.
+            pending = seen_hashes.get(file_hash)
+            if pending is not None:
+                local_path = await pending
+                if local_path is None:
+                    return None
+                img_data['local_path'] = local_path
+                return img_data
+            
+            pending = asyncio.get_running_loop().create_future()
+            seen_hashes[file_hash] = pending
+            local_path = None
+            try:
+                local_path = await _save_image(img_data, spool, content_type, file_hash, images_dir, convert_to_webp, executor)
+            finally:
+                pending.set_result(local_path)
+            
+            return img_data
+        
+    except Exception as e:
+        print(f"[Warning] Failed to download {url}: {e}")
+        return None
+
+
+async def _save_image(img_data, spool, content_type, file_hash, images_dir, convert_to_webp, executor=None):
+    """
+    Write a spooled download to disk, converting raster images to WebP.
+    
+    Encoding runs in `executor` (the loop's default pool when None) and file
+    writes go through aiofiles, so neither blocks the event loop.
+    Returns the local path.
+    """
+    
+    # Determine file extension
+    url = img_data['url']
+    original_ext = Path(urlparse(url).path).suffix.lower()
+    
+    # The origin already sent WebP in response to IMAGE_ACCEPT, so keep it as-is
+    if convert_to_webp and content_type in NEGOTIATED_FORMATS:
+        filename = f"{file_hash}{NEGOTIATED_FORMATS[content_type]}"
+        await _write_spool(images_dir / filename, spool)
+    
+    # Convert to WebP if requested and it's a raster image
+    elif convert_to_webp and original_ext in ['.jpg', '.jpeg', '.png', '.gif']:
+        try:
+            spool.seek(0)
+            loop = asyncio.get_running_loop()
+            webp_bytes = await loop.run_in_executor(executor, encode_to_webp, spool.read())
+            
+            filename = f"{file_hash}.webp"
+            await _write_file(images_dir / filename, webp_bytes)
+            img_data['converted'] = True
+            
+        except Exception as e:
+            print(f"[Warning] Could not convert {url} to WebP: {e}")
+            # Save original
+            filename = f"{file_hash}{original_ext or '.jpg'}"
+            await _write_spool(images_dir / filename, spool)
+    else:
+        # Save original
+        filename = f"{file_hash}{original_ext or '.jpg'}"
+        await _write_spool(images_dir / filename, spool)
+    
+    img_data['local_path'] = f"assets/images/{filename}"
+    return img_data['local_path']
+
+
+async def _save_svg(svg_data, svg_dir):
+    """
+    Write an inline SVG to svg_dir.
+    
+    Returns the updated svg_data, or None if the write failed.
+    """
+    
+    index = svg_data.get('index')
+    try:
+        filename = f"inline-svg-{index}.svg"
+        await _write_file(svg_dir / filename, svg_data['content'].encode('utf-8'))
+        svg_data['local_path'] = f"assets/svg/{filename}"
+        return svg_data
+    except Exception as e:
+        print(f"[Warning] Failed to save SVG {index}: {e}")
+        return None
+
+
+async def _write_file(filepath, data):
+    """Write bytes to filepath without blocking the event loop."""
+    async with aiofiles.open(filepath, 'wb') as f:
+        await f.write(data)
+
+
+async def _write_spool(filepath, spool):
+    """Copy a spooled download to filepath chunk by chunk without blocking the event loop."""
+    spool.seek(0)
+    async with aiofiles.open(filepath, 'wb') as f:
+        while chunk := spool.read(DOWNLOAD_CHUNK_SIZE):
+            await f.write(chunk)
+
+
+def encode_to_webp(content, quality=85):
+    """
+    Encode raster image bytes as WebP, flattening transparency onto white.
+    
+    Pure function of its inputs so it can run in a thread or process pool.
+    """
+    
+    # Imported here so only processes that actually encode load Pillow
+    from PIL import Image
+    
+    # open() only reads the header, so oversized images are refused before
+    # any pixels are decoded
+    image = Image.open(io.BytesIO(content))
+    if image.width * image.height > MAX_ENCODE_PIXELS:
+        raise ValueError(f"{image.width}x{image.height} image is too large to encode")
+    
+    # Palette images only need compositing when they carry transparency
+    if image.mode in ('P', 'PA'):
+        has_alpha = image.mode == 'PA' or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    
+    # Flatten transparency onto white. getchannel() copies just the alpha
+    # band (split() would copy all four), and Pillow pastes RGBA/LA into
+    # RGB directly without converting the source first.
+    if image.mode in ('RGBA', 'LA'):
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    
+    output = io.BytesIO()
+    image.save(output, 'WEBP', quality=quality)
+    return output.getvalue()
@@ -2,65 +2,84 @@
 Extract text content and page structure
 """
 
-async def extract_content(page):
-    """
-    Extract all visible text content and page structure.
-    
-    Returns structured content including headings, paragraphs, lists, and navigation.
-    """
-    
-    content = await page.evaluate("""
-        () => {
-            const result = {
-                headings: [],
-                paragraphs: [],
-                lists: [],
-                navigation: [],
-                structure: []
-            };
-            
-            // Helper to check if element is visible
-            function isVisible(el) {
-                const style = window.getComputedStyle(el);
-                return style.display !== 'none' && 
-                       style.visibility !== 'hidden' && 
-                       style.opacity !== '0' &&
-                       el.offsetParent !== null;
-            }
-            
-            // Helper to get clean text
-            function getCleanText(el) {
-                return el.innerText?.trim() || '';
+from .dom_index import DOM_INDEX_JS
+
+EXTRACT_CONTENT_JS = """
+    (dom) => {
+        dom = dom || (""" + DOM_INDEX_JS + """)();
+        
+        const result = {
+            headings: [],
+            paragraphs: [],
+            lists: [],
+            navigation: [],
+            structure: []
+        };
+        
+        // Visibility is checked more than once for many elements (e.g. a
+        // heading and the section around it), so cache it per element
+        const visibility = new Map();
+        
+        // Helper to check if element is visible
+        function isVisible(el) {
+            let visible = visibility.get(el);
+            if (visible === undefined) {
+                // offsetParent is null for anything not rendered, which
+                // settles most hidden elements without a style lookup
+                if (el.offsetParent === null) {
+                    visible = false;
+                } else {
+                    const style = dom.style(el);
+                    visible = style.display !== 'none' && 
+                              style.visibility !== 'hidden' && 
+                              style.opacity !== '0';
+                }
+                visibility.set(el, visible);
             }
+            return visible;
+        }
+        
+        // Helper to get clean text
+        function getCleanText(el) {
+            return el.innerText?.trim() || '';
+        }
+        
+        // Headings are reported grouped by level (all h1s, then h2s, ...)
+        const headingsByLevel = [[], [], [], [], [], []];
+        const HEADING_TAGS = new Set(['H1', 'H2', 'H3', 'H4', 'H5', 'H6']);
+        const SECTION_TAGS = new Set(['SECTION', 'ARTICLE', 'MAIN', 'ASIDE', 'HEADER', 'FOOTER']);
+        const NAV_SCOPE = 'nav, header, [role="navigation"]';
+        
+        // Classify each element in one pass over the shared index,
+        // instead of running a separate querySelectorAll per element type
+        for (const el of dom.elements) {
+            const tagName = el.tagName;
             
             // Extract headings with hierarchy
-            ['h1', 'h2', 'h3', 'h4', 'h5', 'h6'].forEach(tag => {
-                document.querySelectorAll(tag).forEach(el => {
-                    if (isVisible(el)) {
-                        const text = getCleanText(el);
-                        if (text) {
-                            result.headings.push({
-                                level: parseInt(tag[1]),
-                                text: text,
-                                tag: tag
-                            });
-                        }
+            if (HEADING_TAGS.has(tagName)) {
+                if (isVisible(el)) {
+                    const text = getCleanText(el);
+                    if (text) {
+                        const level = parseInt(tagName[1]);
+                        headingsByLevel[level - 1].push({
+                            level: level,
+                            text: text,
+                            tag: tagName.toLowerCase()
+                        });
                     }
-                });
-            });
+                }
             
             // Extract paragraphs (exclude hidden ones)
-            document.querySelectorAll('p').forEach(el => {
+            } else if (tagName === 'P') {
                 if (isVisible(el)) {
                     const text = getCleanText(el);
                     if (text && text.length > 10) {  // Filter out very short paragraphs
                         result.paragraphs.push(text);
                     }
                 }
-            });
             
             // Extract lists
-            document.querySelectorAll('ul, ol').forEach(el => {
+            } else if (tagName === 'UL' || tagName === 'OL') {
                 if (isVisible(el)) {
                     const items = Array.from(el.querySelectorAll('li'))
                         .filter(li => isVisible(li))
@@ -69,16 +88,15 @@ async def extract_content(page):
                     
                     if (items.length > 0) {
                         result.lists.push({
-                            type: el.tagName.toLowerCase(),
+                            type: tagName.toLowerCase(),
                             items: items
                         });
                     }
                 }
-            });
             
             // Extract navigation items
-            document.querySelectorAll('nav a, header a, [role="navigation"] a').forEach(el => {
-                if (isVisible(el)) {
+            } else if (tagName === 'A') {
+                if (el.closest(NAV_SCOPE) && isVisible(el)) {
                     const text = getCleanText(el);
                     const href = el.getAttribute('href');
                     if (text) {
@@ -88,34 +106,45 @@ async def extract_content(page):
                         });
                     }
                 }
-            });
+            }
             
             // Extract page structure (sections and their content)
-            document.querySelectorAll('section, article, main, aside, header, footer').forEach(el => {
-                if (isVisible(el)) {
-                    const tagName = el.tagName.toLowerCase();
-                    const className = el.className;
-                    const id = el.id;
-                    
-                    // Get headings within this section
-                    const sectionHeadings = Array.from(el.querySelectorAll('h1, h2, h3, h4, h5, h6'))
-                        .filter(h => isVisible(h))
-                        .map(h => getCleanText(h))
-                        .filter(text => text);
-                    
-                    if (sectionHeadings.length > 0 || tagName === 'header' || tagName === 'footer') {
-                        result.structure.push({
-                            tag: tagName,
-                            id: id || null,
-                            class: className || null,
-                            headings: sectionHeadings
-                        });
-                    }
+            if (SECTION_TAGS.has(tagName) && isVisible(el)) {
+                const tag = tagName.toLowerCase();
+                const className = el.className;
+                const id = el.id;
+                
+                // Get headings within this section
+                const sectionHeadings = Array.from(el.querySelectorAll('h1, h2, h3, h4, h5, h6'))
+                    .filter(h => isVisible(h))
+                    .map(h => getCleanText(h))
+                    .filter(text => text);
+                
+                if (sectionHeadings.length > 0 || tag === 'header' || tag === 'footer') {
+                    result.structure.push({
+                        tag: tag,
+                        id: id || null,
+                        class: className || null,
+                        headings: sectionHeadings
+                    });
                 }
-            });
-            
-            return result;
+            }
         }
-    """)
+        
+        result.headings = headingsByLevel.flat();
+        
+        return result;
+    }
+"""
+
+
+async def extract_content(page):
+    """
+    Extract all visible text content and page structure.
+    
+    Returns structured content including headings, paragraphs, lists, and navigation.
+    """
+    
+    content = await page.evaluate(EXTRACT_CONTENT_JS)
     
     return content
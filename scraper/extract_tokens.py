@@ -2,151 +2,228 @@
 Extract design tokens: colors, fonts, CSS variables
 """
 
-async def extract_tokens(page):
-    """
-    Extract design tokens from the page including CSS variables,
-    colors, and font families.
-    """
-    
-    tokens = await page.evaluate("""
-        () => {
-            const result = {
-                css_variables: {},
-                colors: {
-                    primary: [],
-                    text: [],
-                    background: [],
-                    border: []
-                },
-                fonts: {
-                    families: [],
-                    weights: [],
-                    sizes: []
-                },
-                spacing: [],
-                breakpoints: []
-            };
-            
-            // Extract CSS variables from :root
-            const rootStyles = window.getComputedStyle(document.documentElement);
-            
-            // Get all CSS variable names
-            for (let i = 0; i < rootStyles.length; i++) {
-                const prop = rootStyles[i];
-                if (prop.startsWith('--')) {
-                    const value = rootStyles.getPropertyValue(prop).trim();
-                    result.css_variables[prop] = value;
+from .dom_index import DOM_INDEX_JS
+
+EXTRACT_TOKENS_JS = """
+    (dom) => {
+        dom = dom || (""" + DOM_INDEX_JS + """)();
+        
+        const result = {
+            css_variables: {},
+            colors: {
+                primary: [],
+                text: [],
+                background: [],
+                border: []
+            },
+            fonts: {
+                families: [],
+                weights: [],
+                sizes: []
+            },
+            spacing: [],
+            breakpoints: []
+        };
+        
+        // Extract CSS variables from :root
+        const rootStyles = dom.style(document.documentElement);
+        
+        // Get all CSS variable names
+        for (let i = 0; i < rootStyles.length; i++) {
+            const prop = rootStyles[i];
+            if (prop.startsWith('--')) {
+                const value = rootStyles.getPropertyValue(prop).trim();
+                result.css_variables[prop] = value;
+            }
+        }
+        
+        // Helper to normalize color. Colors repeat across elements, so each
+        // raw value is resolved once, through a single probe element that
+        // stays attached until sampling is done. It hangs off <html>, after
+        // <body>, so body's children keep matching :last-child, :has() and
+        // the like exactly as on the real page.
+        const colorCache = new Map();
+        let probe = null;
+        let probeStyle = null;
+        
+        function normalizeColor(color) {
+            let computed = colorCache.get(color);
+            if (computed === undefined) {
+                if (!probe) {
+                    probe = document.createElement('div');
+                    document.documentElement.appendChild(probe);
+                    probeStyle = window.getComputedStyle(probe);
                 }
+                // Cleared first so an invalid value doesn't keep the last color
+                probe.style.color = '';
+                probe.style.color = color;
+                computed = probeStyle.color;
+                colorCache.set(color, computed);
             }
+            return computed;
+        }
+        
+        // Colors per category, deduplicated by the Sets. Only the first
+        // MAX_COLORS of each are reported, so a full category skips
+        // normalizing any more.
+        const MAX_COLORS = 10;
+        const colors = {
+            primary: new Set(),
+            text: new Set(),
+            background: new Set(),
+            border: new Set()
+        };
+        
+        function addUniqueColor(set, color) {
+            if (set.size >= MAX_COLORS) {
+                return;
+            }
+            const normalized = normalizeColor(color);
+            if (normalized && normalized !== 'rgba(0, 0, 0, 0)') {
+                set.add(normalized);
+            }
+        }
+        
+        // Collect the elements to sample for colors and fonts, and those
+        // to sample for spacing, in one pass over the index
+        const HEADING_TAGS = new Set(['H1', 'H2', 'H3', 'H4', 'H5', 'H6']);
+        const headings = [];
+        const paragraphs = [];
+        const links = [];
+        const buttons = [];
+        const buttonClassed = [];
+        const btnClassed = [];
+        const spacingElements = [];
+        
+        for (const el of dom.elements) {
+            const tagName = el.tagName;
+            const className = el.getAttribute('class') || '';
             
-            // Helper to normalize color
-            function normalizeColor(color) {
-                const div = document.createElement('div');
-                div.style.color = color;
-                document.body.appendChild(div);
-                const computed = window.getComputedStyle(div).color;
-                document.body.removeChild(div);
-                return computed;
+            if (HEADING_TAGS.has(tagName)) {
+                headings.push(el);
+            } else if (tagName === 'P') {
+                paragraphs.push(el);
+            } else if (tagName === 'A') {
+                links.push(el);
+            } else if (tagName === 'BUTTON') {
+                buttons.push(el);
             }
             
-            // Helper to check if color is unique
-            function addUniqueColor(array, color) {
-                const normalized = normalizeColor(color);
-                if (normalized && normalized !== 'rgba(0, 0, 0, 0)' && !array.includes(normalized)) {
-                    array.push(normalized);
-                }
+            if (className.includes('button')) {
+                buttonClassed.push(el);
+            }
+            if (className.includes('btn')) {
+                btnClassed.push(el);
             }
             
-            // Sample elements to extract colors and fonts
-            const elementsToSample = [
-                ...document.querySelectorAll('h1, h2, h3, h4, h5, h6'),
-                ...document.querySelectorAll('p'),
-                ...document.querySelectorAll('a'),
-                ...document.querySelectorAll('button'),
-                ...document.querySelectorAll('[class*="button"]'),
-                ...document.querySelectorAll('[class*="btn"]'),
-                document.body,
-                document.querySelector('header'),
-                document.querySelector('nav'),
-                document.querySelector('footer')
-            ].filter(Boolean);
+            if (tagName === 'SECTION' || (tagName === 'DIV' && (className.includes('container') || className.includes('wrapper')))) {
+                spacingElements.push(el);
+            }
+        }
+        
+        // Sample elements to extract colors and fonts
+        const elementsToSample = [
+            ...headings,
+            ...paragraphs,
+            ...links,
+            ...buttons,
+            ...buttonClassed,
+            ...btnClassed,
+            document.body,
+            dom.tag('HEADER')[0],
+            dom.tag('NAV')[0],
+            dom.tag('FOOTER')[0]
+        ].filter(Boolean);
+        
+        const seenFonts = new Set();
+        const seenSizes = new Set();
+        const seenWeights = new Set();
+        
+        elementsToSample.forEach(el => {
+            const style = dom.style(el);
+            const tagName = el.tagName;
             
-            const seenFonts = new Set();
-            const seenSizes = new Set();
-            const seenWeights = new Set();
+            // Extract colors
+            const color = style.color;
+            const bgColor = style.backgroundColor;
+            const borderColor = style.borderColor;
             
-            elementsToSample.forEach(el => {
-                const style = window.getComputedStyle(el);
-                
-                // Extract colors
-                const color = style.color;
-                const bgColor = style.backgroundColor;
-                const borderColor = style.borderColor;
-                
-                // Categorize colors
-                if (el.tagName === 'BODY' || el.tagName === 'HTML') {
-                    addUniqueColor(result.colors.background, bgColor);
-                } else if (el.tagName.startsWith('H') || el.tagName === 'P' || el.tagName === 'SPAN') {
-                    addUniqueColor(result.colors.text, color);
-                } else if (el.tagName === 'BUTTON' || el.className.includes('button') || el.className.includes('btn')) {
-                    addUniqueColor(result.colors.primary, bgColor);
-                    addUniqueColor(result.colors.primary, color);
-                }
-                
-                if (bgColor && bgColor !== 'rgba(0, 0, 0, 0)') {
-                    addUniqueColor(result.colors.background, bgColor);
-                }
-                
-                if (borderColor && borderColor !== 'rgba(0, 0, 0, 0)') {
-                    addUniqueColor(result.colors.border, borderColor);
-                }
-                
-                // Extract fonts
-                const fontFamily = style.fontFamily;
-                if (fontFamily && !seenFonts.has(fontFamily)) {
-                    seenFonts.add(fontFamily);
-                    result.fonts.families.push(fontFamily);
-                }
-                
-                const fontSize = style.fontSize;
-                if (fontSize && !seenSizes.has(fontSize)) {
-                    seenSizes.add(fontSize);
-                    result.fonts.sizes.push(fontSize);
-                }
-                
-                const fontWeight = style.fontWeight;
-                if (fontWeight && !seenWeights.has(fontWeight)) {
-                    seenWeights.add(fontWeight);
-                    result.fonts.weights.push(fontWeight);
-                }
-            });
+            // Categorize colors
+            if (tagName === 'BODY' || tagName === 'HTML') {
+                addUniqueColor(colors.background, bgColor);
+            } else if (tagName.startsWith('H') || tagName === 'P' || tagName === 'SPAN') {
+                addUniqueColor(colors.text, color);
+            } else if (tagName === 'BUTTON' || el.className.includes('button') || el.className.includes('btn')) {
+                addUniqueColor(colors.primary, bgColor);
+                addUniqueColor(colors.primary, color);
+            }
             
-            // Try to extract spacing values from common elements
-            const spacingElements = document.querySelectorAll('section, div[class*="container"], div[class*="wrapper"]');
-            const seenSpacing = new Set();
+            if (bgColor && bgColor !== 'rgba(0, 0, 0, 0)') {
+                addUniqueColor(colors.background, bgColor);
+            }
             
-            spacingElements.forEach(el => {
-                const style = window.getComputedStyle(el);
-                [style.padding, style.margin, style.gap].forEach(value => {
-                    if (value && value !== '0px' && !seenSpacing.has(value)) {
-                        seenSpacing.add(value);
-                        result.spacing.push(value);
-                    }
-                });
-            });
+            if (borderColor && borderColor !== 'rgba(0, 0, 0, 0)') {
+                addUniqueColor(colors.border, borderColor);
+            }
             
-            // Sort font sizes numerically
-            result.fonts.sizes.sort((a, b) => parseFloat(a) - parseFloat(b));
+            // Extract fonts
+            const fontFamily = style.fontFamily;
+            if (fontFamily && !seenFonts.has(fontFamily)) {
+                seenFonts.add(fontFamily);
+                result.fonts.families.push(fontFamily);
+            }
             
-            // Limit results to most common values
-            result.colors.primary = result.colors.primary.slice(0, 10);
-            result.colors.text = result.colors.text.slice(0, 10);
-            result.colors.background = result.colors.background.slice(0, 10);
-            result.colors.border = result.colors.border.slice(0, 10);
-            result.spacing = result.spacing.slice(0, 15);
+            const fontSize = style.fontSize;
+            if (fontSize && !seenSizes.has(fontSize)) {
+                seenSizes.add(fontSize);
+                result.fonts.sizes.push(fontSize);
+            }
             
-            return result;
+            const fontWeight = style.fontWeight;
+            if (fontWeight && !seenWeights.has(fontWeight)) {
+                seenWeights.add(fontWeight);
+                result.fonts.weights.push(fontWeight);
+            }
+        });
+        
+        if (probe) {
+            probe.remove();
         }
-    """)
+        
+        // Try to extract spacing values from common elements
+        const seenSpacing = new Set();
+        
+        spacingElements.forEach(el => {
+            const style = dom.style(el);
+            [style.padding, style.margin, style.gap].forEach(value => {
+                if (value && value !== '0px' && !seenSpacing.has(value)) {
+                    seenSpacing.add(value);
+                    result.spacing.push(value);
+                }
+            });
+        });
+        
+        // Sort font sizes numerically
+        result.fonts.sizes.sort((a, b) => parseFloat(a) - parseFloat(b));
+        
+        // Limit results to most common values
+        result.colors.primary = [...colors.primary];
+        result.colors.text = [...colors.text];
+        result.colors.background = [...colors.background];
+        result.colors.border = [...colors.border];
+        result.spacing = result.spacing.slice(0, 15);
+        
+        return result;
+    }
+"""
+
+
+async def extract_tokens(page):
+    """
+    Extract design tokens from the page including CSS variables,
+    colors, and font families.
+    """
+    
+    tokens = await page.evaluate(EXTRACT_TOKENS_JS)
     
     return tokens
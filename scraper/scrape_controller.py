@@ -2,18 +2,251 @@
 Main scraper controller that orchestrates all extraction tasks
 """
 
-from playwright.async_api import async_playwright
-import json
+import aiofiles
+import asyncio
+from contextlib import asynccontextmanager
+import gzip
+import inspect
+import orjson
+import os
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
+import sys
+import traceback
+from urllib.parse import urlparse
 
-from .extract_content import extract_content
-from .extract_assets import extract_assets, download_assets
-from .extract_tokens import extract_tokens
-from .extract_meta import extract_meta
+from .extract_all import EXTRACT_ALL_INIT_JS, extract_all
+from .extract_assets import download_assets
 
 
-async def scrape_website(url: str, save_assets: bool = True, convert_to_webp: bool = True, timeout: int = 60000) -> dict:
+class _SourcelessInspect:
+    """Stand-in for the inspect module whose stack() doesn't read source."""
+    
+    @staticmethod
+    def stack(context=1):
+        frames = []
+        frame = sys._getframe(1)
+        while frame is not None:
+            code = frame.f_code
+            frames.append(inspect.FrameInfo(frame, code.co_filename, frame.f_lineno, code.co_name, None, None))
+            frame = frame.f_back
+        return frames
+    
+    def __getattr__(self, name):
+        return getattr(inspect, name)
+
+
+class _SourcelessTraceback:
+    """Stand-in for the traceback module whose extract_stack() doesn't read source."""
+    
+    @staticmethod
+    def extract_stack(f=None, limit=None):
+        if f is None:
+            f = sys._getframe(1)
+        # Source lines are looked up lazily, if the stack is ever printed
+        stack = traceback.StackSummary.extract(traceback.walk_stack(f), limit=limit, lookup_lines=False)
+        stack.reverse()
+        return stack
+    
+    def __getattr__(self, name):
+        return getattr(traceback, name)
+
+
+def _skip_playwright_source_lookups():
+    """
+    Stop Playwright from reading source files on every API call.
+    
+    Playwright records the caller's stack (inspect.stack() and
+    traceback.extract_stack()) for each call so the driver and error
+    messages can point at user code. Both read the source line of every
+    frame, which dominates the cost of cheap calls like evaluate
+    (playwright-python #2744). The frames themselves are cheap, so keep
+    them and skip the source. Set PW_INSPECT_STACK=1 to use the stock
+    functions.
+    """
+    if os.environ.get("PW_INSPECT_STACK") == "1":
+        return
+    
+    from playwright._impl import _connection, _network
+    
+    _connection.inspect = _SourcelessInspect()
+    _connection.traceback = _SourcelessTraceback()
+    _network.inspect = _SourcelessInspect()
+
+
+# Chromium flags for running in containers (Railway/Docker)
+BROWSER_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--disable-dev-shm-usage',
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-software-rasterizer',
+    '--disable-extensions',
+]
+
+# Output files are written compact unless PRETTY_JSON=1. With
+# GZIP_OUTPUT=1 they are also gzipped (as .json.gz) at the fastest level,
+# which still shrinks JSON several times over.
+PRETTY_JSON = os.environ.get("PRETTY_JSON") == "1"
+GZIP_OUTPUT = os.environ.get("GZIP_OUTPUT") == "1"
+
+# Scrapes allowed in the browser at once per process (asset downloads run
+# after the page is closed and aren't counted). Each open page costs a few
+# hundred MB in Chromium, so on small instances extra requests queue here
+# rather than pushing the container into swap or the OOM killer. Raise it
+# on hosts with more memory.
+MAX_CONCURRENT_SCRAPES = int(os.environ.get("MAX_CONCURRENT_SCRAPES", "2"))
+_scrape_semaphore = asyncio.Semaphore(MAX_CONCURRENT_SCRAPES)
+
+# Scrolls through the page a viewport at a time to trigger lazy-loaded
+# images. Each step only waits for the next frame (when
+# IntersectionObservers and loading=lazy react) rather than a fixed delay,
+# then the page gets one idle period for any loaders to run.
+LAZY_LOAD_SCROLL_JS = """
+    async () => {
+        const nextFrame = () => new Promise(resolve => requestAnimationFrame(() => requestAnimationFrame(resolve)));
+        const viewportHeight = window.innerHeight || 1000;
+        const scrollHeight = document.documentElement.scrollHeight;
+        const steps = Math.min(20, Math.ceil(scrollHeight / viewportHeight)); // Max 20 viewports
+        
+        for (let i = 1; i <= steps; i++) {
+            window.scrollTo(0, i * viewportHeight);
+            await nextFrame();
+        }
+        
+        await new Promise(resolve => requestIdleCallback(resolve, {timeout: 1500}));
+        
+        // Scroll back to top
+        window.scrollTo(0, 0);
+    }
+"""
+
+# Installed in every scrape context before navigation, so the scroll and
+# extraction scripts are compiled during page load and each later call is
+# a one-line evaluate
+PAGE_INIT_JS = (
+    EXTRACT_ALL_INIT_JS +
+    "if (window.top === window) {\n"
+    "    Object.defineProperty(window, '__scraperLazyLoadScroll', {value: " + LAZY_LOAD_SCROLL_JS + "});\n"
+    "}\n"
+)
+
+# Longest we wait for requests started after the load event (deferred
+# scripts, lazy images revealed by scrolling) to finish, in milliseconds
+NETWORK_SETTLE_TIMEOUT = 3000
+
+VIEWPORT = {'width': 1920, 'height': 1080}
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+
+# Requests that don't affect anything we extract are aborted before they
+# hit the network. Images and stylesheets are still loaded: image sizes
+# and computed styles come from them. Fonts aren't needed for computed
+# font-family, and analytics/ad hosts only slow the load event down.
+BLOCKED_RESOURCE_TYPES = {'media', 'font'}
+BLOCKED_HOSTS = (
+    'doubleclick.net',
+    'googlesyndication.com',
+    'googletagmanager.com',
+    'google-analytics.com',
+    'googleadservices.com',
+    'segment.com',
+    'segment.io',
+    'connect.facebook.net',
+    'hotjar.com',
+    'mixpanel.com',
+    'amplitude.com',
+    'fullstory.com',
+    'clarity.ms',
+    'intercom.io',
+)
+
+
+def _is_blocked_host(url: str) -> bool:
+    host = urlparse(url).hostname or ''
+    return any(host == blocked or host.endswith('.' + blocked) for blocked in BLOCKED_HOSTS)
+
+
+async def _block_unneeded_requests(route):
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or _is_blocked_host(request.url):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+class BrowserPool:
+    """
+    A Chromium instance shared across scrapes.
+    
+    Launching a browser costs a second or more, so it is started once and
+    each scrape gets a fresh context from it instead; contexts don't share
+    cookies or storage. The browser is launched on first use and relaunched
+    if it has crashed or disconnected.
+    """
+    
+    def __init__(self):
+        self._playwright = None
+        self._browser = None
+        self._lock = asyncio.Lock()
+    
+    async def start(self):
+        """Launch the browser if it isn't already running."""
+        async with self._lock:
+            if self._browser is not None and self._browser.is_connected():
+                return self._browser
+            
+            if self._playwright is None:
+                # Playwright is imported on first launch rather than with
+                # this module, which keeps it out of startup and out of
+                # processes that never scrape
+                from playwright.async_api import async_playwright
+                
+                _skip_playwright_source_lookups()
+                self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(
+                headless=True,
+                args=BROWSER_ARGS
+            )
+            return self._browser
+    
+    async def stop(self):
+        """Close the browser and stop Playwright."""
+        async with self._lock:
+            try:
+                if self._browser is not None:
+                    await self._browser.close()
+            finally:
+                self._browser = None
+                if self._playwright is not None:
+                    await self._playwright.stop()
+                    self._playwright = None
+    
+    @asynccontextmanager
+    async def acquire(self):
+        """Yield a new browser context, closed on exit."""
+        browser = await self.start()
+        context = await browser.new_context(
+            viewport=VIEWPORT,
+            user_agent=USER_AGENT
+        )
+        try:
+            yield context
+        finally:
+            await context.close()
+
+
+async def _write_json(path: Path, data):
+    content = orjson.dumps(data, option=orjson.OPT_INDENT_2 if PRETTY_JSON else None)
+    if GZIP_OUTPUT:
+        content = gzip.compress(content, compresslevel=1)
+        path = path.with_name(path.name + ".gz")
+    
+    async with aiofiles.open(path, "wb") as f:
+        await f.write(content)
+
+
+async def scrape_website(url: str, save_assets: bool = True, convert_to_webp: bool = True, timeout: int = 60000, session=None, executor=None, pool=None) -> dict:
     """
     Main scraping function that coordinates all extraction tasks.
     
@@ -22,104 +255,121 @@ async def scrape_website(url: str, save_assets: bool = True, convert_to_webp: bo
         save_assets: Whether to download assets locally
         convert_to_webp: Convert images to WebP format
         timeout: Page load timeout in milliseconds
+        session: Shared aiohttp session for asset downloads (optional)
+        executor: Executor for WebP encoding, e.g. a process pool (optional)
+        pool: Shared BrowserPool (optional). Without one a browser is
+            launched for this call and closed afterwards.
     
     Returns:
-        Dictionary containing all extracted data
+        Dictionary containing all extracted data. If an extractor failed,
+        its section is empty and "errors" maps its name to the error.
     """
     
-    async with async_playwright() as p:
-        # Launch browser with increased timeout settings
-        # Railway/production-ready configuration
-        browser = await p.chromium.launch(
-            headless=True,
-            args=[
-                '--disable-blink-features=AutomationControlled',
-                '--disable-dev-shm-usage',
-                '--no-sandbox',
-                '--disable-setuid-sandbox',
-                '--disable-gpu',
-                '--disable-software-rasterizer',
-                '--disable-extensions',
-                '--single-process',  # Important for Railway
-            ]
-        )
+    async with _scrape_semaphore:
+        owns_pool = pool is None
+        if owns_pool:
+            pool = BrowserPool()
         
         try:
-            # Create a new context with realistic settings
-            context = await browser.new_context(
-                viewport={'width': 1920, 'height': 1080},
-                user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            )
-            
-            page = await context.new_page()
-            
-            # Set longer timeout for navigation
-            page.set_default_timeout(timeout)
-            
-            print(f"[Scraper] Navigating to {url}...")
-            
-            # Navigate and wait for load (use 'load' instead of 'networkidle' for faster response)
-            await page.goto(url, wait_until='load', timeout=timeout)
-            
-            # Brief wait for any immediate dynamic content
-            await page.wait_for_timeout(1000)
-            
-            # Quick scroll to trigger lazy-loaded images (optimized)
-            await page.evaluate("""
-                async () => {
-                    const scrollHeight = document.documentElement.scrollHeight;
-                    const steps = Math.min(5, Math.ceil(scrollHeight / 1000)); // Max 5 scroll steps
-                    
-                    for (let i = 0; i < steps; i++) {
-                        window.scrollBy(0, scrollHeight / steps);
-                        await new Promise(resolve => setTimeout(resolve, 200));
-                    }
-                    
-                    // Scroll back to top
-                    window.scrollTo(0, 0);
-                }
-            """)
-            
-            print("[Scraper] Page loaded, extracting data...")
-            
-            # Extract all data in parallel where possible
-            content_data = await extract_content(page)
-            assets_data = await extract_assets(page, url)
-            tokens_data = await extract_tokens(page)
-            meta_data = await extract_meta(page, url)
-            
-            # Download assets if requested
-            if save_assets and assets_data:
-                print("[Scraper] Downloading assets...")
-                assets_data = await download_assets(assets_data, convert_to_webp)
-            
-            # Save output files
-            output_dir = Path("output")
-            output_dir.mkdir(exist_ok=True)
-            
-            # Save individual JSON files
-            with open(output_dir / "content.json", "w", encoding="utf-8") as f:
-                json.dump(content_data, f, indent=2, ensure_ascii=False)
-            
-            with open(output_dir / "assets.json", "w", encoding="utf-8") as f:
-                json.dump(assets_data, f, indent=2, ensure_ascii=False)
-            
-            with open(output_dir / "tokens.json", "w", encoding="utf-8") as f:
-                json.dump(tokens_data, f, indent=2, ensure_ascii=False)
-            
-            with open(output_dir / "meta.json", "w", encoding="utf-8") as f:
-                json.dump(meta_data, f, indent=2, ensure_ascii=False)
-            
-            print("[Scraper] Scraping complete!")
-            
-            # Return combined result
-            return {
-                "content": content_data,
-                "assets": assets_data,
-                "tokens": tokens_data,
-                "meta": meta_data,
-                "scraped_at": datetime.now().isoformat()
-            }
-            
+            async with pool.acquire() as context:
+                await context.route("**/*", _block_unneeded_requests)
+                await context.add_init_script(PAGE_INIT_JS)
+                page = await context.new_page()
+                
+                # Set longer timeout for navigation
+                page.set_default_timeout(timeout)
+                
+                print(f"[Scraper] Navigating to {url}...")
+                
+                # Navigate and wait for load (use 'load' instead of 'networkidle' for faster response)
+                await page.goto(url, wait_until='load', timeout=timeout)
+                
+                # Track requests made from here on, so we can wait for the
+                # ones the scroll starts rather than for page-wide network
+                # idle, which stays set once it has fired before the scroll
+                pending_requests = set()
+                settled = asyncio.Event()
+                
+                def on_request(request):
+                    pending_requests.add(request)
+                    settled.clear()
+                
+                def on_request_done(request):
+                    pending_requests.discard(request)
+                    if not pending_requests:
+                        settled.set()
+                
+                page.on("request", on_request)
+                page.on("requestfinished", on_request_done)
+                page.on("requestfailed", on_request_done)
+                
+                # Trigger lazy-loaded images (see LAZY_LOAD_SCROLL_JS). The
+                # requests this starts are waited on below. The init script
+                # may not have attached (sandboxed or replaced documents), so
+                # fall back to running the full script like extract_all does.
+                scrolled = await page.evaluate(
+                    "() => typeof window.__scraperLazyLoadScroll === 'function'"
+                    " ? window.__scraperLazyLoadScroll().then(() => true) : false"
+                )
+                if not scrolled:
+                    await page.evaluate(LAZY_LOAD_SCROLL_JS)
+                
+                page.remove_listener("request", on_request)
+                if pending_requests:
+                    try:
+                        await asyncio.wait_for(settled.wait(), NETWORK_SETTLE_TIMEOUT / 1000)
+                    except asyncio.TimeoutError:
+                        # Pages that poll or stream never settle; extract anyway
+                        pass
+                page.remove_listener("requestfinished", on_request_done)
+                page.remove_listener("requestfailed", on_request_done)
+                
+                print("[Scraper] Page loaded, extracting data...")
+                
+                # Extract everything in one evaluate rather than one per extractor
+                extracted = await extract_all(page, url)
+                content_data = extracted["content"]
+                assets_data = extracted["assets"]
+                tokens_data = extracted["tokens"]
+                meta_data = extracted["meta"]
+                errors = extracted["errors"]
+        
         finally:
-            await browser.close()
+            if owns_pool:
+                await pool.stop()
+    
+    # Download assets if requested. The browser context is closed by now;
+    # downloads, WebP encoding and the output writes don't use Chromium
+    # memory, so they run outside the semaphore and a slow asset host
+    # doesn't hold up queued scrapes.
+    if save_assets and assets_data:
+        print("[Scraper] Downloading assets...")
+        assets_data = await download_assets(assets_data, convert_to_webp, session=session, executor=executor)
+    
+    # Save output files
+    output_dir = Path("output")
+    output_dir.mkdir(exist_ok=True)
+    
+    # Save individual JSON files
+    await asyncio.gather(
+        _write_json(output_dir / "content.json", content_data),
+        _write_json(output_dir / "assets.json", assets_data),
+        _write_json(output_dir / "tokens.json", tokens_data),
+        _write_json(output_dir / "meta.json", meta_data)
+    )
+    
+    print("[Scraper] Scraping complete!")
+    
+    # Return combined result
+    result = {
+        "content": content_data,
+        "assets": assets_data,
+        "tokens": tokens_data,
+        "meta": meta_data,
+        "scraped_at": datetime.now(timezone.utc).isoformat(timespec="seconds")
+    }
+    # A section an extractor failed on is empty; say so rather than pass it
+    # off as a page with no such data
+    if errors:
+        result["errors"] = errors
+    return result
@@ -2,8 +2,138 @@
 v0.dev integration for creating apps from scraped data
 """
 
-import httpx
-from typing import Dict, Any
+import orjson
+from typing import Dict, Any, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import httpx
+
+
+# Most images, headings and paragraphs included in a prompt, so image- or
+# text-heavy pages don't produce an oversized prompt and request body
+MAX_PROMPT_IMAGES = 25
+MAX_PROMPT_HEADINGS = 20
+MAX_PROMPT_PARAGRAPHS = 30
+
+# Longest single piece of page text (heading, paragraph, alt text, link or
+# list item) copied into the prompt, and the longest the whole prompt may
+# get; past that the page content is cut at a line break before the footer
+MAX_PROMPT_ITEM_CHARS = 1000
+MAX_PROMPT_CHARS = 60000
+
+
+def _clip(text) -> str:
+    """Shorten page text to MAX_PROMPT_ITEM_CHARS"""
+    text = str(text)
+    if len(text) > MAX_PROMPT_ITEM_CHARS:
+        return text[:MAX_PROMPT_ITEM_CHARS] + "…"
+    return text
+
+# The fixed parts of the prompt, joined once at import. build_v0_prompt
+# only formats the parts that come from the scraped page.
+_PREAMBLE = "\n".join([
+    "🚀 Create a STUNNING, WORLD-CLASS, MODERN website that is 100X BETTER than the original!",
+    "",
+    "Transform this website into something AMAZING using React + Tailwind CSS + shadcn/ui.",
+    "",
+    "🎯 YOUR MISSION:",
+    "- Take the content below and make it look INCREDIBLE",
+    "- Modern, sleek, professional design with beautiful animations",
+    "- Think Apple, Stripe, Linear - that level of polish",
+    "- Make it feel premium, fast, and delightful to use",
+    "",
+    "🚨 CRITICAL REQUIREMENTS:",
+    "1. ✅ Use EVERY piece of text content EXACTLY as written (don't change the words)",
+    "2. ✅ Use ALL image URLs provided with exact URLs (no placeholders)",
+    "3. 🎨 Make the DESIGN 100X BETTER than the original:",
+    "   - Beautiful modern layout",
+    "   - Stunning typography and spacing",
+    "   - Smooth animations and transitions",
+    "   - Professional color usage",
+    "   - Perfect mobile responsive",
+    "   - Modern UI patterns (glassmorphism, subtle shadows, etc.)",
+    "4. 🔥 Add DELIGHT:",
+    "   - Hover effects on buttons and cards",
+    "   - Smooth scroll animations",
+    "   - Beautiful hero section",
+    "   - Engaging CTAs",
+    "5. ⚡ Make it FAST and ACCESSIBLE",
+    "",
+    "# Original Website",
+])
+
+_FOOTER = "\n".join([
+    "# 🎨 DESIGN & LAYOUT REQUIREMENTS",
+    "",
+    "## Layout Structure",
+    "1. **Header/Navigation**",
+    "   - Sticky/fixed at top",
+    "   - Use navigation items listed above",
+    "",
+    "2. **Hero Section**",
+    "   - Use first image from images list above",
+    "   - Use first heading as hero title",
+    "   - Include primary CTA button",
+    "",
+    "3. **Content Sections**",
+    "   - Use ALL headings in proper hierarchy",
+    "   - Use ALL paragraph text provided",
+    "   - Place images where they appear in the content flow",
+    "",
+    "4. **Footer**",
+    "   - Contact information",
+    "   - Navigation links",
+    "",
+    "## 🎨 Visual Style - Make It STUNNING",
+    "",
+    "Transform this into a world-class website:",
+    "",
+    "**Design Inspiration:**",
+    "- Apple.com level of polish",
+    "- Stripe.com level of professionalism",
+    "- Linear.app level of modern UI",
+    "",
+    "**Specific Improvements:**",
+    "- 🎨 Beautiful color scheme (use extracted colors but make them pop)",
+    "- ✨ Stunning typography (modern fonts, perfect spacing)",
+    "- 🌊 Smooth animations (fade-ins, parallax, hover effects)",
+    "- 📱 Perfect mobile experience",
+    "- 🎯 Clear visual hierarchy (guide user's eye)",
+    "- 💎 Premium feel (subtle gradients, shadows, blur effects)",
+    "- ⚡ Fast loading (optimized images)",
+    "- ♿ Accessible (WCAG compliant)",
+    "",
+    "**UI Elements to Enhance:**",
+    "- Hero section: Make it STUNNING with overlays and CTAs",
+    "- Buttons: Modern, with hover states and icons",
+    "- Cards: Elevated with shadows and hover effects",
+    "- Navigation: Sleek, sticky, with smooth transitions",
+    "- Images: Full-width hero images, beautiful galleries",
+    "- Spacing: Generous whitespace, breathing room",
+    "- Icons: Add relevant icons from lucide-react",
+    "",
+    "## 🚨 CRITICAL - DO NOT:",
+    "- ❌ Do NOT use placeholder images - use the EXACT URLs provided",
+    "- ❌ Do NOT use lorem ipsum - use the EXACT text provided",
+    "- ❌ Do NOT skip any content - include EVERYTHING",
+    "- ❌ Do NOT change the wording - copy it EXACTLY",
+    "- ❌ Do NOT just copy the old design - TRANSFORM IT!",
+    "",
+    "## ✅ MUST DO - MAKE IT INCREDIBLE:",
+    "- ✅ Use ALL images from the images list with their exact URLs",
+    "- ✅ Use ALL text content exactly as provided (same words)",
+    "- ✅ Make the DESIGN 100X better than the original",
+    "- ✅ Add beautiful animations and interactions",
+    "- ✅ Use modern UI patterns (cards, gradients, shadows)",
+    "- ✅ Make it feel premium and professional",
+    "- ✅ Perfect mobile responsive experience",
+    "- ✅ Add delight with micro-interactions",
+    "- ✅ Use shadcn/ui components for consistency",
+    "- ✅ Make every section visually stunning",
+    "",
+    "🎯 GOAL: Same content, but make it look like a $50,000 professional website!",
+    "Think: \"What would this look like if Apple designed it?\"",
+])
 
 
 def build_v0_prompt(scrape_data: Dict[str, Any], url: str) -> str:
@@ -23,215 +153,147 @@ def build_v0_prompt(scrape_data: Dict[str, Any], url: str) -> str:
     tokens = scrape_data.get('tokens', {})
     meta = scrape_data.get('meta', {})
     
-    # Build the prompt
-    lines = []
+    # Looked up once here rather than at each use below
+    title = _clip(meta.get('title', 'Untitled'))
+    description = meta.get('description')
+    colors = tokens.get('colors') or {}
+    font_families = (tokens.get('fonts') or {}).get('families')
+    # Largest images first, as they are the likeliest heroes; sorted()
+    # keeps page order among images of the same size
+    images = sorted(
+        assets.get('images') or [],
+        key=lambda img: (img.get('width') or 0) * (img.get('height') or 0),
+        reverse=True
+    )[:MAX_PROMPT_IMAGES]
+    headings = (content.get('headings') or [])[:MAX_PROMPT_HEADINGS]
+    paragraphs = (content.get('paragraphs') or [])[:MAX_PROMPT_PARAGRAPHS]
+    navigation = content.get('navigation')
+    content_lists = content.get('lists')
     
-    lines.append("🚀 Create a STUNNING, WORLD-CLASS, MODERN website that is 100X BETTER than the original!")
-    lines.append("")
-    lines.append("Transform this website into something AMAZING using React + Tailwind CSS + shadcn/ui.")
-    lines.append("")
-    lines.append("🎯 YOUR MISSION:")
-    lines.append("- Take the content below and make it look INCREDIBLE")
-    lines.append("- Modern, sleek, professional design with beautiful animations")
-    lines.append("- Think Apple, Stripe, Linear - that level of polish")
-    lines.append("- Make it feel premium, fast, and delightful to use")
-    lines.append("")
-    lines.append("🚨 CRITICAL REQUIREMENTS:")
-    lines.append("1. ✅ Use EVERY piece of text content EXACTLY as written (don't change the words)")
-    lines.append("2. ✅ Use ALL image URLs provided with exact URLs (no placeholders)")
-    lines.append("3. 🎨 Make the DESIGN 100X BETTER than the original:")
-    lines.append("   - Beautiful modern layout")
-    lines.append("   - Stunning typography and spacing")
-    lines.append("   - Smooth animations and transitions")
-    lines.append("   - Professional color usage")
-    lines.append("   - Perfect mobile responsive")
-    lines.append("   - Modern UI patterns (glassmorphism, subtle shadows, etc.)")
-    lines.append("4. 🔥 Add DELIGHT:")
-    lines.append("   - Hover effects on buttons and cards")
-    lines.append("   - Smooth scroll animations")
-    lines.append("   - Beautiful hero section")
-    lines.append("   - Engaging CTAs")
-    lines.append("5. ⚡ Make it FAST and ACCESSIBLE")
-    lines.append("")
-    lines.append("# Original Website")
+    # Build the prompt
+    lines = [_PREAMBLE]
     lines.append(f"URL: {url}")
-    lines.append(f"Title: {meta.get('title', 'Untitled')}")
-    if meta.get('description'):
-        lines.append(f"Description: {meta.get('description')}")
+    lines.append(f"Title: {title}")
+    if description:
+        lines.append(f"Description: {_clip(description)}")
     lines.append("")
     
     # Design tokens
-    if tokens.get('colors'):
+    if colors:
         lines.append("# Design System")
         lines.append("")
         
-        colors = tokens['colors']
         if colors.get('primary'):
             lines.append("## Primary Colors")
-            for color in colors['primary'][:3]:
-                lines.append(f"- {color}")
+            lines.extend(f"- {color}" for color in colors['primary'][:3])
             lines.append("")
         
         if colors.get('text'):
             lines.append("## Text Colors")
-            for color in colors['text'][:2]:
-                lines.append(f"- {color}")
+            lines.extend(f"- {color}" for color in colors['text'][:2])
             lines.append("")
     
     # Fonts
-    if tokens.get('fonts', {}).get('families'):
+    if font_families:
         lines.append("## Typography")
-        for font in tokens['fonts']['families'][:2]:
-            lines.append(f"- Font: {font}")
+        lines.extend(f"- Font: {font}" for font in font_families[:2])
         lines.append("")
     
     # Images - MOST IMPORTANT - Put this FIRST
-    if assets.get('images'):
+    if images:
         lines.append("# 🖼️ IMAGES - USE THESE EXACT URLs!")
         lines.append("")
         lines.append("⚠️ IMPORTANT: Use these EXACT image URLs in your code. Do NOT use placeholders!")
         lines.append("")
-        for i, img in enumerate(assets['images'], 1):
+        for i, img in enumerate(images, 1):
             url_full = img.get('url', '')
-            alt = img.get('alt', f'Image {i}')
+            alt = _clip(img.get('alt', f'Image {i}'))
             lines.append(f"{i}. {alt}")
-            lines.append(f"   URL: {url_full}")
+            lines.append(f"   URL: {_clip(url_full)}")
             lines.append(f"   Alt text: {alt}")
             lines.append("")
         lines.append("")
     
     # All Headings with EXACT text
-    if content.get('headings'):
+    if headings:
         lines.append("# 📝 HEADINGS - Use EXACT Text")
         lines.append("")
         lines.append("Copy these headings EXACTLY as written, maintaining hierarchy:")
         lines.append("")
-        for heading in content['headings']:
-            level = heading.get('level', 1)
-            text = heading.get('text', '')
-            lines.append(f"{'#' * level} {text}")
+        lines.extend(f"{'#' * heading.get('level', 1)} {_clip(heading.get('text', ''))}" for heading in headings)
         lines.append("")
     
     # All Paragraphs with EXACT text
-    if content.get('paragraphs'):
+    if paragraphs:
         lines.append("# 📄 PARAGRAPHS - Use EXACT Text")
         lines.append("")
         lines.append("Include ALL of this text content in your website:")
         lines.append("")
-        for i, para in enumerate(content['paragraphs'], 1):
+        for i, para in enumerate(paragraphs, 1):
             if len(para) > 10:
                 lines.append(f"Paragraph {i}:")
-                lines.append(f'"{para}"')
+                lines.append(f'"{_clip(para)}"')
                 lines.append("")
         lines.append("")
     
     # Navigation
-    if content.get('navigation'):
+    if navigation:
         lines.append("# 🧭 NAVIGATION - Use EXACT Text")
         lines.append("")
-        for nav in content['navigation']:
+        for nav in navigation:
             text = nav.get('text', '')
             href = nav.get('href', '#')
             if text:
-                lines.append(f"- {text} (link: {href})")
+                lines.append(f"- {_clip(text)} (link: {_clip(href)})")
         lines.append("")
     
     # Lists
-    if content.get('lists'):
+    if content_lists:
         lines.append("# 📋 LISTS - Use EXACT Text")
         lines.append("")
-        for list_item in content['lists']:
-            list_type = list_item.get('type', 'ul')
+        for list_item in content_lists:
             items = list_item.get('items', [])
             if items:
-                for item in items:
-                    lines.append(f"• {item}")
+                lines.extend(f"• {_clip(item)}" for item in items)
                 lines.append("")
     
-    # Layout guidance
-    lines.append("# 🎨 DESIGN & LAYOUT REQUIREMENTS")
-    lines.append("")
-    lines.append("## Layout Structure")
-    lines.append("1. **Header/Navigation**")
-    lines.append("   - Sticky/fixed at top")
-    lines.append("   - Use navigation items listed above")
-    lines.append("")
-    lines.append("2. **Hero Section**")
-    lines.append("   - Use first image from images list above")
-    lines.append("   - Use first heading as hero title")
-    lines.append("   - Include primary CTA button")
-    lines.append("")
-    lines.append("3. **Content Sections**")
-    lines.append("   - Use ALL headings in proper hierarchy")
-    lines.append("   - Use ALL paragraph text provided")
-    lines.append("   - Place images where they appear in the content flow")
-    lines.append("")
-    lines.append("4. **Footer**")
-    lines.append("   - Contact information")
-    lines.append("   - Navigation links")
-    lines.append("")
-    lines.append("## 🎨 Visual Style - Make It STUNNING")
-    lines.append("")
-    lines.append("Transform this into a world-class website:")
-    lines.append("")
-    lines.append("**Design Inspiration:**")
-    lines.append("- Apple.com level of polish")
-    lines.append("- Stripe.com level of professionalism")
-    lines.append("- Linear.app level of modern UI")
-    lines.append("")
-    lines.append("**Specific Improvements:**")
-    lines.append("- 🎨 Beautiful color scheme (use extracted colors but make them pop)")
-    lines.append("- ✨ Stunning typography (modern fonts, perfect spacing)")
-    lines.append("- 🌊 Smooth animations (fade-ins, parallax, hover effects)")
-    lines.append("- 📱 Perfect mobile experience")
-    lines.append("- 🎯 Clear visual hierarchy (guide user's eye)")
-    lines.append("- 💎 Premium feel (subtle gradients, shadows, blur effects)")
-    lines.append("- ⚡ Fast loading (optimized images)")
-    lines.append("- ♿ Accessible (WCAG compliant)")
-    lines.append("")
-    lines.append("**UI Elements to Enhance:**")
-    lines.append("- Hero section: Make it STUNNING with overlays and CTAs")
-    lines.append("- Buttons: Modern, with hover states and icons")
-    lines.append("- Cards: Elevated with shadows and hover effects")
-    lines.append("- Navigation: Sleek, sticky, with smooth transitions")
-    lines.append("- Images: Full-width hero images, beautiful galleries")
-    lines.append("- Spacing: Generous whitespace, breathing room")
-    lines.append("- Icons: Add relevant icons from lucide-react")
-    lines.append("")
-    lines.append("## 🚨 CRITICAL - DO NOT:")
-    lines.append("- ❌ Do NOT use placeholder images - use the EXACT URLs provided")
-    lines.append("- ❌ Do NOT use lorem ipsum - use the EXACT text provided")
-    lines.append("- ❌ Do NOT skip any content - include EVERYTHING")
-    lines.append("- ❌ Do NOT change the wording - copy it EXACTLY")
-    lines.append("- ❌ Do NOT just copy the old design - TRANSFORM IT!")
-    lines.append("")
-    lines.append("## ✅ MUST DO - MAKE IT INCREDIBLE:")
-    lines.append("- ✅ Use ALL images from the images list with their exact URLs")
-    lines.append("- ✅ Use ALL text content exactly as provided (same words)")
-    lines.append("- ✅ Make the DESIGN 100X better than the original")
-    lines.append("- ✅ Add beautiful animations and interactions")
-    lines.append("- ✅ Use modern UI patterns (cards, gradients, shadows)")
-    lines.append("- ✅ Make it feel premium and professional")
-    lines.append("- ✅ Perfect mobile responsive experience")
-    lines.append("- ✅ Add delight with micro-interactions")
-    lines.append("- ✅ Use shadcn/ui components for consistency")
-    lines.append("- ✅ Make every section visually stunning")
-    lines.append("")
-    lines.append("🎯 GOAL: Same content, but make it look like a $50,000 professional website!")
-    lines.append("Think: \"What would this look like if Apple designed it?\"")
+    # Navigation and lists aren't capped by count, so bound the page content
+    # as a whole; the closing instructions are always kept
+    body = "\n".join(lines)
+    limit = MAX_PROMPT_CHARS - len(_FOOTER) - 1
+    if len(body) > limit:
+        body = body[:body.rfind("\n", 0, limit)]
+    
+    # Layout guidance and closing instructions
+    return body + "\n" + _FOOTER
+
+
+def create_v0_client() -> "httpx.AsyncClient":
+    """
+    Create an HTTP client for the v0.dev API.
     
-    return "\n".join(lines)
+    Meant to be shared across calls so requests reuse an open HTTP/2
+    connection instead of a new TLS handshake each time.
+    """
+    # httpx (with h2) is slow to import and only needed for v0 calls
+    import httpx
     
-    return "\n".join(lines)
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=120.0,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=50)
+    )
 
 
-async def send_to_v0(prompt: str, api_key: str) -> Dict[str, Any]:
+async def send_to_v0(prompt: str, api_key: str, client: "httpx.AsyncClient" = None) -> Dict[str, Any]:
     """
     Send prompt to v0.dev API to generate a website.
     
     Args:
         prompt: The formatted prompt
         api_key: v0.dev API key
+        client: Shared client from create_v0_client() (optional). Without
+            one a client is created and closed for this call.
     
     Returns:
         v0.dev API response
@@ -252,10 +314,17 @@ async def send_to_v0(prompt: str, api_key: str) -> Dict[str, Any]:
         }
     }
     
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        response = await client.post(url, headers=headers, json=payload)
+    owns_client = client is None
+    if owns_client:
+        client = create_v0_client()
+    
+    try:
+        response = await client.post(url, headers=headers, content=orjson.dumps(payload))
         
         if response.status_code != 200:
             raise Exception(f"v0 API error {response.status_code}: {response.text}")
         
         return response.json()
+    finally:
+        if owns_client:
+            await client.aclose()
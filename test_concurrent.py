@@ -2,25 +2,24 @@
 Test concurrent requests to the API
 """
 
-import requests
+import asyncio
+import httpx
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 API_URL = "https://scrape-create-production.up.railway.app/scrape"
 
-def scrape_sync(url, request_num):
-    """Synchronous scraping request"""
+async def scrape_async(client, url, request_num):
+    """Send one scraping request and report how it went"""
     start = time.time()
     try:
-        response = requests.post(
+        response = await client.post(
             API_URL,
-            json={"url": url, "save_assets": False},
-            timeout=120
+            json={"url": url, "save_assets": False}
         )
         elapsed = time.time() - start
         
         if response.status_code == 200:
-            return {
+            result = {
                 "request": request_num,
                 "url": url,
                 "status": "success",
@@ -28,7 +27,7 @@ def scrape_sync(url, request_num):
                 "data": response.json()
             }
         else:
-            return {
+            result = {
                 "request": request_num,
                 "url": url,
                 "status": "failed",
@@ -37,16 +36,20 @@ def scrape_sync(url, request_num):
             }
     except Exception as e:
         elapsed = time.time() - start
-        return {
+        result = {
             "request": request_num,
             "url": url,
             "status": "error",
             "time": elapsed,
             "error": str(e)
         }
+    
+    status_emoji = "✅" if result["status"] == "success" else "❌"
+    print(f"{status_emoji} Request #{result['request']}: {result['status']} - {result['time']:.1f}s - {result['url']}")
+    return result
 
-def test_concurrent_sync(num_requests=3):
-    """Test concurrent requests using ThreadPoolExecutor"""
+async def test_concurrent(num_requests=3):
+    """Test concurrent requests from a single event loop"""
     
     print(f"\n🧪 Testing {num_requests} concurrent requests...")
     print("=" * 60)
@@ -60,22 +63,12 @@ def test_concurrent_sync(num_requests=3):
     
     start_time = time.time()
     
-    # Submit concurrent requests
-    with ThreadPoolExecutor(max_workers=num_requests) as executor:
-        futures = []
-        for i in range(num_requests):
-            url = urls[i % len(urls)]
-            future = executor.submit(scrape_sync, url, i+1)
-            futures.append(future)
-        
-        # Collect results
-        results = []
-        for future in as_completed(futures):
-            result = future.result()
-            results.append(result)
-            
-            status_emoji = "✅" if result["status"] == "success" else "❌"
-            print(f"{status_emoji} Request #{result['request']}: {result['status']} - {result['time']:.1f}s - {result['url']}")
+    # Send all requests at once; results are printed as they complete
+    async with httpx.AsyncClient(timeout=120) as client:
+        results = await asyncio.gather(
+            *(scrape_async(client, urls[i % len(urls)], i+1) for i in range(num_requests)),
+            return_exceptions=True
+        )
     
     total_time = time.time() - start_time
     
@@ -84,7 +77,7 @@ def test_concurrent_sync(num_requests=3):
     print(f"   Total time: {total_time:.1f}s")
     print(f"   Average time per request: {total_time/num_requests:.1f}s")
     
-    successful = sum(1 for r in results if r["status"] == "success")
+    successful = sum(1 for r in results if isinstance(r, dict) and r["status"] == "success")
     print(f"   Successful: {successful}/{num_requests}")
     
     if successful == num_requests:
@@ -103,11 +96,11 @@ if __name__ == "__main__":
     
     # Test 1: Light load (3 concurrent)
     print("\n📝 Test 1: Light load (3 concurrent requests)")
-    test_concurrent_sync(3)
+    asyncio.run(test_concurrent(3))
     
     # Test 2: Medium load (5 concurrent)
     print("\n\n📝 Test 2: Medium load (5 concurrent requests)")
-    test_concurrent_sync(5)
+    asyncio.run(test_concurrent(5))
     
     print("\n" + "=" * 60)
     print("✅ Concurrent testing complete!")
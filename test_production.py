@@ -2,132 +2,333 @@
 Test the production deployment on Railway
 """
 
-import requests
+import argparse
+import asyncio
+import functools
+import hashlib
 import json
+import orjson
 import sys
 import time
+from pathlib import Path
 
-def test_deployment(base_url):
-    """Test all endpoints of the deployed API"""
+# Page the scrape check asks the API to scrape; override with --target
+DEFAULT_TARGET = "https://example.com"
+
+# With --cache, scrape responses are kept between runs per deployment and
+# request body. Off by default: a cached result skips the real /scrape call
+CACHE_DIR = Path(".scrape_cache")
+
+def _cache_path(base_url, body):
+    """Cache file for an encoded scrape request body sent to base_url"""
+    key = hashlib.sha256(base_url.encode() + b"\0" + body)
+    return CACHE_DIR / f"{key.hexdigest()}.json"
+
+# Validators (ETag/Last-Modified) and bodies from earlier probes, so
+# repeat runs can revalidate and get a bodyless 304 back
+ETAG_STORE = Path(".etags.json")
+
+def _load_etags():
+    if ETAG_STORE.exists():
+        return json.loads(ETAG_STORE.read_text())
+    return {}
+
+async def _probe(client, base_url, path, etags, method="GET"):
+    """Request one endpoint; returns (status, parsed JSON body or None)"""
+    cached = etags.get(path, {})
+    headers = {}
+    if cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
     
-    print(f"🧪 Testing deployment at: {base_url}")
-    print("=" * 60)
+    response = await client.request(method, f"{base_url}{path}", headers=headers, follow_redirects=True)
+    if response.status_code == 304:
+        return response.status_code, cached.get("body")
+    body = None
+    if response.status_code == 200 and response.headers.get("content-type", "").startswith("application/json"):
+        body = response.json()
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if response.status_code == 200 and (etag or last_modified):
+        etags[path] = {"etag": etag, "last_modified": last_modified, "body": body}
+    return response.status_code, body
+
+# The server sends a progress event every few seconds while it scrapes;
+# going this long without one means the scrape or the connection is stuck
+STREAM_STALL_TIMEOUT = 30
+
+async def _read_events(response):
+    """Yield (event, data) pairs from a text/event-stream response"""
+    buffer = bytearray()
+    async for chunk in response.aiter_bytes():
+        # Only the new bytes (plus one for a split separator) need scanning
+        scan_from = max(len(buffer) - 1, 0)
+        buffer += chunk
+        while (end := buffer.find(b"\n\n", scan_from)) != -1:
+            event, data = "message", []
+            for line in bytes(buffer[:end]).split(b"\n"):
+                if line.startswith(b"event:"):
+                    event = line[6:].strip().decode()
+                elif line.startswith(b"data:"):
+                    data.append(line[5:].lstrip())
+            del buffer[:end + 2]
+            scan_from = 0
+            yield event, b"\n".join(data)
+
+async def _post_scrape(client, base_url, body, show_progress):
+    """
+    POST /scrape, following the server's progress events while it works.
+    Returns (status, raw response body, seconds taken). Progress is only
+    printed once show_progress is set.
+    """
+    import httpx
     
-    # Remove trailing slash
-    base_url = base_url.rstrip('/')
+    # Open the connection with a cheap request first, so the reported time
+    # is the server's scrape and not the TCP+TLS handshake
+    await client.get(f"{base_url}/health")
+    start_time = time.time()
+    async with client.stream(
+        "POST",
+        f"{base_url}/scrape?stream=1",
+        content=body,
+        headers={
+            "Content-Type": "application/json",
+            "Accept": "text/event-stream"
+        },
+        # Covers waiting for the response headers, which a server without
+        # streaming support only sends once the scrape is done
+        timeout=httpx.Timeout(10.0, read=120.0)
+    ) as response:
+        if not response.headers.get("content-type", "").startswith("text/event-stream"):
+            # Server without streaming support: a plain JSON response
+            raw = await response.aread()
+            return response.status_code, raw, time.time() - start_time
+        
+        # From here the scrape is alive for as long as events keep arriving
+        events = _read_events(response)
+        while True:
+            try:
+                event, data = await asyncio.wait_for(anext(events), STREAM_STALL_TIMEOUT)
+            except StopAsyncIteration:
+                break
+            if event == "progress":
+                if show_progress.is_set():
+                    print(f"   ⏳ Still scraping... ({orjson.loads(data)['elapsed']:.0f}s)")
+            elif event == "done":
+                return 200, data, time.time() - start_time
+            elif event == "error":
+                error = orjson.loads(data)
+                return error["status_code"], orjson.dumps({"detail": error["detail"]}), time.time() - start_time
+        
+        raise httpx.RemoteProtocolError("Scrape event stream ended without a result")
+
+# Counts printed after a successful scrape: section heading, then
+# (label, key path into the result's "data") per line
+SUMMARY = [
+    ("📝 Content extracted", [
+        ("Headings", ("content", "headings")),
+        ("Paragraphs", ("content", "paragraphs")),
+        ("Lists", ("content", "lists")),
+        ("Navigation items", ("content", "navigation")),
+    ]),
+    ("🎨 Assets extracted", [
+        ("Images", ("assets", "images")),
+        ("SVGs", ("assets", "svgs")),
+    ]),
+    ("🎭 Design tokens", [
+        ("Primary colors", ("tokens", "colors", "primary")),
+        ("Font families", ("tokens", "fonts", "families")),
+        ("CSS variables", ("tokens", "css_variables")),
+    ]),
+]
+
+def _lookup(data, path):
+    """Follow a key path through nested dicts; {} where anything is missing"""
+    return functools.reduce(lambda d, key: d.get(key) or {}, path, data)
+
+async def _selftest(client, base_url):
+    """
+    Tests 1-3 in one request via GET /selftest, as _probe-style
+    (status, body) results; None if the server has no such endpoint.
+    """
+    response = await client.get(f"{base_url}/selftest")
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    checks = response.json()
+    return tuple(
+        (200 if checks[name]["ok"] else 503, checks[name].get("body"))
+        for name in ("root", "health", "docs")
+    )
+
+def _report_probes(base_url, root, health, docs):
+    """Print the results of tests 1-3; returns False if a required one failed"""
     
     # Test 1: Root endpoint
     print("\n1️⃣  Testing root endpoint...")
-    try:
-        response = requests.get(f"{base_url}/", timeout=10)
-        if response.status_code == 200:
-            print("✅ Root endpoint working!")
-            print(f"   Response: {response.json()}")
-        else:
-            print(f"❌ Root endpoint failed: {response.status_code}")
-            return False
-    except Exception as e:
-        print(f"❌ Root endpoint error: {e}")
+    if isinstance(root, Exception):
+        print(f"❌ Root endpoint error: {root}")
+        return False
+    status, data = root
+    if status in (200, 304):
+        print("✅ Root endpoint working!")
+        print(f"   Response: {data}")
+    else:
+        print(f"❌ Root endpoint failed: {status}")
         return False
     
     # Test 2: Health check
     print("\n2️⃣  Testing health endpoint...")
-    try:
-        response = requests.get(f"{base_url}/health", timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            print("✅ Health check passed!")
-            print(f"   Status: {data.get('status')}")
-            print(f"   Timestamp: {data.get('timestamp')}")
-        else:
-            print(f"❌ Health check failed: {response.status_code}")
-            return False
-    except Exception as e:
-        print(f"❌ Health check error: {e}")
+    if isinstance(health, Exception):
+        print(f"❌ Health check error: {health}")
+        return False
+    status, data = health
+    if status in (200, 304):
+        print("✅ Health check passed!")
+        print(f"   Status: {data.get('status')}")
+        print(f"   Timestamp: {data.get('timestamp')}")
+    else:
+        print(f"❌ Health check failed: {status}")
         return False
     
     # Test 3: API docs
     print("\n3️⃣  Testing API docs...")
-    try:
-        response = requests.get(f"{base_url}/docs", timeout=10)
-        if response.status_code == 200:
-            print("✅ API docs accessible!")
-            print(f"   Visit: {base_url}/docs")
-        else:
-            print(f"❌ API docs failed: {response.status_code}")
-    except Exception as e:
-        print(f"⚠️  API docs error: {e}")
+    if isinstance(docs, Exception):
+        print(f"⚠️  API docs error: {docs}")
+    elif docs[0] in (200, 304):
+        print("✅ API docs accessible!")
+        print(f"   Visit: {base_url}/docs")
+    else:
+        print(f"❌ API docs failed: {docs[0]}")
     
-    # Test 4: Actual scraping (this will take longer)
-    print("\n4️⃣  Testing scraper endpoint (this may take 30-60 seconds)...")
-    print("   Scraping https://example.com...")
+    return True
+
+async def test_deployment(base_url, target=DEFAULT_TARGET, use_cache=False):
+    """Test all endpoints of the deployed API"""
+    # httpx (with h2) is slow to import, so it is loaded here rather than at
+    # the top; --help and usage errors return without paying for it
+    import httpx
     
-    start_time = time.time()
+    print(f"🧪 Testing deployment at: {base_url}")
+    print("=" * 60)
     
-    try:
-        response = requests.post(
-            f"{base_url}/scrape",
-            json={
-                "url": "https://example.com",
-                "save_assets": False,  # Faster without downloading assets
-                "convert_to_webp": False,
-                "timeout": 60000
-            },
-            timeout=120  # 2 minute timeout
-        )
-        
-        elapsed = time.time() - start_time
-        
-        if response.status_code == 200:
-            data = response.json()
-            print(f"✅ Scraping successful! (took {elapsed:.1f}s)")
-            print(f"\n📊 Results:")
-            print(f"   Status: {data.get('status')}")
-            print(f"   URL: {data.get('url')}")
-            
-            # Extract key metrics
-            content = data.get('data', {}).get('content', {})
-            assets = data.get('data', {}).get('assets', {})
-            tokens = data.get('data', {}).get('tokens', {})
-            meta = data.get('data', {}).get('meta', {})
-            
-            print(f"\n   📝 Content extracted:")
-            print(f"      - Headings: {len(content.get('headings', []))}")
-            print(f"      - Paragraphs: {len(content.get('paragraphs', []))}")
-            print(f"      - Lists: {len(content.get('lists', []))}")
-            print(f"      - Navigation items: {len(content.get('navigation', []))}")
-            
-            print(f"\n   🎨 Assets extracted:")
-            print(f"      - Images: {len(assets.get('images', []))}")
-            print(f"      - SVGs: {len(assets.get('svgs', []))}")
-            
-            print(f"\n   🎭 Design tokens:")
-            print(f"      - Primary colors: {len(tokens.get('colors', {}).get('primary', []))}")
-            print(f"      - Font families: {len(tokens.get('fonts', {}).get('families', []))}")
-            print(f"      - CSS variables: {len(tokens.get('css_variables', {}))}")
-            
-            print(f"\n   📄 Metadata:")
-            print(f"      - Title: {meta.get('title')}")
-            print(f"      - Description: {meta.get('description')[:50]}..." if meta.get('description') else "      - Description: None")
+    # Remove trailing slash
+    base_url = base_url.rstrip('/')
+    
+    # One HTTP/2 client: over HTTPS every check below is multiplexed onto a
+    # single connection, so the whole run pays for one TCP+TLS handshake
+    async with httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=4, max_keepalive_connections=4),
+        timeout=10.0
+    ) as client:
+        # Encoded once; the same bytes are the request body and cache key
+        body = orjson.dumps({
+            "url": target,
+            "save_assets": False,  # Faster without downloading assets
+            "convert_to_webp": False,
+            "timeout": 60000
+        })
+        cache_path = _cache_path(base_url, body)
+        
+        start_time = time.time()
+        
+        # Test 4 takes 30-60 seconds, so start it first and let tests 1-3
+        # run while the server is scraping
+        scrape_task = None
+        show_progress = asyncio.Event()
+        if not (use_cache and cache_path.exists()):
+            scrape_task = asyncio.create_task(_post_scrape(client, base_url, body, show_progress))
+        
+        # Tests 1-3 in a single round trip where the server supports it
+        try:
+            probes = await _selftest(client, base_url)
+        except Exception as e:
+            probes = (e, e, e)
+        
+        if probes is None:
+            # Older server: the checks are independent GETs, so run them
+            # concurrently and report the results in order once they have
+            # all returned
+            etags = _load_etags()
+            probes = await asyncio.gather(
+                _probe(client, base_url, "/", etags),
+                _probe(client, base_url, "/health", etags),
+                # Only the status matters, so skip the Swagger page body
+                _probe(client, base_url, "/docs", etags, method="HEAD"),
+                return_exceptions=True
+            )
+            ETAG_STORE.write_text(json.dumps(etags))
+        root, health, docs = probes
+        
+        if not _report_probes(base_url, root, health, docs):
+            if scrape_task is not None:
+                scrape_task.cancel()
+            return False
+        
+        # Test 4: Actual scraping (this will take longer)
+        print("\n4️⃣  Testing scraper endpoint (this may take 30-60 seconds)...")
+        print(f"   Scraping {target}...")
+        
+        if scrape_task is None:
+            raw = cache_path.read_bytes()
+            print(f"✅ Loaded cached result from {cache_path} (drop --cache to re-scrape)")
+        else:
+            show_progress.set()
+            try:
+                status, raw, elapsed = await scrape_task
+            except asyncio.TimeoutError:
+                print(f"❌ Scraping stalled after {time.time() - start_time:.1f}s")
+                print(f"   No progress from the server for {STREAM_STALL_TIMEOUT}s; check Railway logs")
+                return False
+            except httpx.TimeoutException:
+                print(f"❌ Scraping timeout after {time.time() - start_time:.1f}s")
+                print("   Try increasing the timeout or check Railway logs")
+                return False
+            except Exception as e:
+                print(f"❌ Scraping error: {e}")
+                return False
             
-            # Save full response
-            output_file = "production_test_result.json"
-            with open(output_file, 'w') as f:
-                json.dump(data, f, indent=2)
-            print(f"\n   💾 Full response saved to: {output_file}")
+            if status != 200:
+                print(f"❌ Scraping failed: {status}")
+                print(f"   Response: {raw.decode(errors='replace')}")
+                return False
             
-        else:
-            print(f"❌ Scraping failed: {response.status_code}")
-            print(f"   Response: {response.text}")
-            return False
+            print(f"✅ Scraping successful! (took {elapsed:.1f}s)")
             
-    except requests.exceptions.Timeout:
-        print(f"❌ Scraping timeout after {time.time() - start_time:.1f}s")
-        print("   Try increasing the timeout or check Railway logs")
-        return False
-    except Exception as e:
-        print(f"❌ Scraping error: {e}")
-        return False
+            if use_cache:
+                cache_path.parent.mkdir(exist_ok=True)
+                cache_path.write_bytes(raw)
+        
+        # Save full response as received, without re-encoding it, on a
+        # worker thread while the summary prints
+        output_file = "production_test_result.json"
+        save_task = asyncio.create_task(asyncio.to_thread(Path(output_file).write_bytes, raw))
+        
+        # Parsed once for the summary
+        data = orjson.loads(raw)
+        
+        print(f"\n📊 Results:")
+        print(f"   Status: {data.get('status')}")
+        print(f"   URL: {data.get('url')}")
+        
+        # Extract key metrics
+        payload = data.get('data') or {}
+        meta = payload.get('meta') or {}
+        description = meta.get('description')
+        
+        for section, rows in SUMMARY:
+            print(f"\n   {section}:")
+            for label, path in rows:
+                print(f"      - {label}: {len(_lookup(payload, path))}")
+        
+        print(f"\n   📄 Metadata:")
+        print(f"      - Title: {meta.get('title')}")
+        print(f"      - Description: {description[:50]}..." if description else "      - Description: None")
+        
+        await save_task
+        print(f"\n   💾 Full response saved to: {output_file}")
     
     print("\n" + "=" * 60)
     print("🎉 All tests passed! Your API is working perfectly!")
@@ -139,13 +340,18 @@ def test_deployment(base_url):
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python test_production.py <RAILWAY_URL>")
-        print("\nExample:")
-        print("  python test_production.py https://scrape-create-production.up.railway.app")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description="Test the deployed API",
+        epilog="Example:\n  python test_production.py https://scrape-create-production.up.railway.app",
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("url", help="Base URL of the deployment")
+    parser.add_argument("--target", default=DEFAULT_TARGET,
+                        help=f"Page to scrape (default: {DEFAULT_TARGET}); point it at a local server to keep the scrape off the internet")
+    parser.add_argument("--cache", action="store_true",
+                        help="Reuse this deployment's cached scrape response instead of calling POST /scrape")
+    args = parser.parse_args()
     
-    url = sys.argv[1]
-    success = test_deployment(url)
+    success = asyncio.run(test_deployment(args.url, target=args.target, use_cache=args.cache))
     
     sys.exit(0 if success else 1)
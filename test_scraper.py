@@ -2,36 +2,86 @@
 Quick test script for the scraper API
 """
 
-import requests
-import json
+import argparse
+import hashlib
+import orjson
+import threading
+from pathlib import Path
+
+# Page the scraper is tested against; override with --target
+DEFAULT_TARGET = "https://example.com"
+
+# Scrape responses are cached per request body between runs; pass
+# --no-cache to always hit the server
+CACHE_DIR = Path(".scrape_cache")
+
+def _cache_path(body):
+    """Cache file for an encoded scrape request body"""
+    return CACHE_DIR / f"{hashlib.sha256(body).hexdigest()}.json"
 
 # Test the API
-def test_scraper():
-    url = "http://localhost:8000"
-    
-    # Health check
-    print("🏥 Testing health endpoint...")
-    response = requests.get(f"{url}/health")
-    print(f"✅ Health: {response.json()}")
-    print()
+def test_scraper(target=DEFAULT_TARGET, use_cache=True):
+    # httpx (with h2) is slow to import, so it is loaded here rather than at
+    # the top; --help and usage errors return without paying for it
+    import httpx
     
-    # Test scraping
-    print("🔍 Testing scraper endpoint...")
-    print("📝 Scraping https://example.com...")
-    
-    response = requests.post(
-        f"{url}/scrape",
-        json={
-            "url": "https://example.com",
+    url = "http://localhost:8000"
+    # HTTP/2 when the server offers it (HTTPS); both calls share a connection
+    with httpx.Client(
+        http2=True,
+        limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
+        timeout=10.0
+    ) as client:
+        
+        # Health check
+        print("🏥 Testing health endpoint...")
+        response = client.get(f"{url}/health")
+        print(f"✅ Health: {response.json()}")
+        print()
+        
+        # Test scraping
+        print("🔍 Testing scraper endpoint...")
+        print(f"📝 Scraping {target}...")
+        
+        # Encoded once; the same bytes are the request body and cache key
+        body = orjson.dumps({
+            "url": target,
             "save_assets": True,
             "convert_to_webp": True,
             "timeout": 30000
-        },
-        timeout=60
-    )
-    
-    if response.status_code == 200:
-        data = response.json()
+        })
+        cache_path = _cache_path(body)
+        
+        if use_cache and cache_path.exists():
+            print(f"📦 Using cached result from {cache_path} (pass --no-cache to re-scrape)")
+            raw = cache_path.read_bytes()
+        else:
+            # The response is large JSON; ask for it compressed
+            response = client.post(
+                f"{url}/scrape",
+                content=body,
+                headers={"Content-Type": "application/json", "Accept-Encoding": "br, gzip"},
+                timeout=60
+            )
+            
+            if response.status_code != 200:
+                print(f"❌ Error: {response.status_code}")
+                print(response.text)
+                return
+            
+            raw = response.content
+            if use_cache:
+                cache_path.parent.mkdir(exist_ok=True)
+                cache_path.write_bytes(raw)
+        
+        # Save the response bytes as received, on a worker thread while the
+        # summary prints; they are already valid JSON, so nothing is re-encoded
+        writer = threading.Thread(target=Path("test_output.json").write_bytes, args=(raw,))
+        writer.start()
+        
+        # Parsed once for the summary
+        data = orjson.loads(raw)
+        
         print("✅ Scraping successful!")
         print(f"📊 Status: {data['status']}")
         print(f"🌐 URL: {data['url']}")
@@ -46,18 +96,24 @@ def test_scraper():
         print(f"  - Fonts: {len(data['data']['tokens']['fonts']['families'])}")
         print(f"  - Title: {data['data']['meta']['title']}")
         print()
-        print("💾 Full response saved to test_output.json")
         
-        with open("test_output.json", "w") as f:
-            json.dump(data, f, indent=2)
-    else:
-        print(f"❌ Error: {response.status_code}")
-        print(response.text)
+        writer.join()
+        print("💾 Full response saved to test_output.json")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quick test of a local scraper API")
+    parser.add_argument("--target", default=DEFAULT_TARGET,
+                        help=f"Page to scrape (default: {DEFAULT_TARGET}); point it at a local server to keep the scrape off the internet")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always POST /scrape instead of reusing a cached response")
+    args = parser.parse_args()
+    
+    # For the ConnectError below; test_scraper imports httpx itself
+    import httpx
+    
     try:
-        test_scraper()
-    except requests.exceptions.ConnectionError:
+        test_scraper(target=args.target, use_cache=not args.no_cache)
+    except httpx.ConnectError:
         print("❌ Could not connect to API. Make sure the server is running:")
         print("   python main.py")
     except Exception as e: